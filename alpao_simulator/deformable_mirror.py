@@ -1,20 +1,24 @@
 import os
 import time
 import numpy as np
-from matplotlib import pyplot as plt
 from alpao_simulator import folder_paths as fp
 from alpao_simulator.ground import osutils as osu
 from alpao_simulator.ground import zernike as zern
+from alpao_simulator.ground import pipeline as _pipe
 from alpao_simulator.ground import geometry as _geo
+from alpao_simulator.ground.packed_cube import PackedCube
+from alpao_simulator.ground.frame_store import FrameStore
 from alpao_simulator.ground.base_deformable_mirror import BaseDeformableMirror
 
 
 class AlpaoDm(BaseDeformableMirror):
 
-    def __init__(self, nActs):
-        super(AlpaoDm, self).__init__(nActs)
+    def __init__(self, nActs, dtype=None):
+        super(AlpaoDm, self).__init__(nActs, dtype)
         self.cmdHistory = None
-        self._shape = np.ma.masked_array(self.mask * 0, mask=self.mask, dtype=float)
+        self.shapeVersion = 0  # incremented at every change of the surface
+        self._pending = np.zeros(self.nActs)
+        self._shape = np.ma.masked_array(self.mask * 0, mask=self.mask, dtype=self.dtype)
         self._idx = np.where(self.mask == 0)
         self._actPos = np.zeros(self.nActs)
         self._live = False
@@ -35,11 +39,54 @@ class AlpaoDm(BaseDeformableMirror):
         scaled_cmd = command * 1e-5  # more realistic command
         self._mirror_command(scaled_cmd, differential, modal)
         if self._live:
-            import time
+            from matplotlib import pyplot as plt
 
             time.sleep(0.15)
             plt.pause(0.05)
 
+    @property
+    def _shape(self):
+        """
+        Surface of the mirror. The actuators moves are applied to it lazily,
+        the first time it is accessed after them, so that rebinned acquisitions
+        (see `binned_shape`) never compute the full resolution surface.
+        """
+        if np.any(self._pending):
+            self._surface[self._idx] += np.dot(self._pending.astype(self.dtype), self.IM)
+            self._pending[:] = 0
+        return self._surface
+
+    @_shape.setter
+    def _shape(self, value):
+        self._surface = value
+        self._pending[:] = 0
+        self.shapeVersion += 1
+
+    def binned_shape(self, rebin: int):
+        """
+        Returns the surface of the mirror rebinned by a factor, without
+        computing the full resolution surface: the stored surface is rebinned,
+        and the actuators moves not yet applied to it are added with a single
+        product at the reduced resolution (see `binnedIM`).
+
+        Parameters
+        ----------
+        rebin : int
+            Rebinning factor.
+
+        Returns
+        -------
+        surface : np.array
+            Packed rebinned surface, on the valid bins of the rebinned mask.
+        bmap : BinMap
+            Bin map of the mask, to unpack the surface (`bmap.unpack`).
+        """
+        IM, bmap = self.binnedIM(rebin)
+        surface = bmap.rebin_valid(self._surface)
+        if np.any(self._pending):
+            surface += np.dot(self._pending.astype(self.dtype), IM).astype(surface.dtype)
+        return surface, bmap
+
     def get_shape(self):
         """
         Returns the current amplitudes commanded to the dm's actuators.
@@ -51,6 +98,46 @@ class AlpaoDm(BaseDeformableMirror):
         """
         return self._actPos.copy()
 
+    def compute_shapes(
+        self, commands, differential: bool = False, modal: bool = False, packed: bool = True
+    ):
+        """
+        Computes the mirror surfaces produced by a block of commands, all at
+        once, without changing the current state of the deformable mirror.
+
+        Parameters
+        ----------
+        commands : np.array
+            Commands block, of shape (nActs, K) (or (nModes, K) if modal), with
+            one command per column, as in `set_shape`.
+        differential : bool
+            If True, the commands are applied differentially to the current
+            shape.
+        modal : bool
+            If True, the commands are modal.
+        packed : bool
+            If True (default), returns the packed surfaces; otherwise a lazy
+            masked cube of them.
+
+        Returns
+        -------
+        shapes : np.array or PackedCube
+            Packed surfaces, of shape (K, npix), with the valid pixels ordered
+            as `mask == 0` indexing, or lazy masked cube (height, width, K).
+        """
+        cmds = np.asarray(commands) * 1e-5  # same scaling as `set_shape`
+        if cmds.ndim == 1:
+            cmds = cmds[:, None]
+        if modal:
+            cmds = np.dot(self.modal2zonal(), cmds)
+        if not differential:
+            cmds = cmds - self._actPos[:, None]
+        shapes = np.dot(cmds.T.astype(self.dtype), self.IM)
+        shapes += self._shape.data[self._idx]
+        if packed:
+            return shapes
+        return PackedCube(shapes.T, self.mask)
+
     def uploadCmdHistory(self, cmdhist):
         """
         Upload the command history to the deformable mirror memory.
@@ -66,6 +153,10 @@ class AlpaoDm(BaseDeformableMirror):
         modal: bool = False,
         differential: bool = True,
         delay: float = 0,
+        pipelined: bool = False,
+        writers: int = 2,
+        progress=None,
+        output: str = "fits",
     ):
         """
         Runs the command history on the deformable mirror.
@@ -81,6 +172,23 @@ class AlpaoDm(BaseDeformableMirror):
         differential : bool
             If True, the command history is applied differentially
             to the initial shape.
+        pipelined : bool
+            If True, the shapes are computed in blocks by a background thread
+            and the frames are saved by a pool of background writers, while
+            the acquisition runs, so that the throughput is limited by the
+            slowest stage instead of the sum of all of them.
+        writers : int
+            Number of writer threads, if pipelined.
+        progress : callable, optional
+            Called as `progress(done, total)` every time a frame is completed,
+            in order. By default, the progress is printed.
+        output : str
+            Output format of the acquired frames:
+            - 'fits' : one `image_{i:05d}.fits` file per frame (default);
+            - 'cube' : a single pre-sized container, with the frames packed
+              on one shared mask and the command history as index (see
+              `ground.frame_store`), read back with `frame_store.load_frames`.
+              It requires an interferometer.
 
         Returns
         -------
@@ -89,6 +197,8 @@ class AlpaoDm(BaseDeformableMirror):
         """
         if self.cmdHistory is None:
             raise Exception("No Command History to run!")
+        elif output == "cube" and interf is None:
+            raise ValueError("The 'cube' output needs an interferometer to acquire the frames")
         else:
             tn = osu.newtn() if save is None else save
             print(f"{tn} - {self.cmdHistory.shape[-1]} images to go.")
@@ -96,18 +206,170 @@ class AlpaoDm(BaseDeformableMirror):
             s = self.get_shape()
             if not os.path.exists(datafold):
                 os.mkdir(datafold)
-            for i, cmd in enumerate(self.cmdHistory.T):
-                print(f"{i+1}/{self.cmdHistory.shape[-1]}", end="\r", flush=True)
+            if progress is None:
+                progress = _print_progress
+            store = None
+            if output == "cube":
+                store = FrameStore(
+                    datafold,
+                    self.cmdHistory.shape[-1],
+                    commands=self.cmdHistory,
+                    info={"rebin": rebin, "modal": modal, "differential": differential},
+                )
+                write = store.write
+            elif output == "fits":
+                def write(i, img):
+                    osu.save_fits(os.path.join(datafold, f"image_{i:05d}.fits"), img)
+            else:
+                raise ValueError(f"Unknown output format '{output}'")
+            try:
+                if pipelined:
+                    self._runPipelinedCmdHistory(
+                        interf, write, rebin, modal, differential, delay, writers, progress
+                    )
+                else:
+                    for i, cmd in enumerate(self.cmdHistory.T):
+                        if differential:
+                            cmd = cmd + s
+                        self.set_shape(cmd, modal=modal)
+                        if interf is not None:
+                            time.sleep(delay)
+                            img = interf.acquire_phasemap(rebin=rebin)
+                            write(i, img)
+                        progress(i + 1, self.cmdHistory.shape[-1])
+            finally:
+                # the initial shape is restored also if the run fails (`s`
+                # holds actuator positions, already scaled: not via `set_shape`)
+                try:
+                    self._mirror_command(s, False, False)
+                finally:
+                    if store is not None:
+                        store.close()
+        return tn
+
+    def iterCmdHistory(
+        self,
+        source=None,
+        interf=None,
+        rebin: int = 1,
+        modal: bool = False,
+        differential: bool = True,
+        delay: float = 0,
+    ):
+        """
+        Runs a command history lazily, yielding the acquired frames as they
+        are produced, so that they can be analyzed on the fly with a constant
+        memory footprint, whatever the length of the history.
+
+        The initial shape of the mirror is restored when the iteration ends
+        (also if it is interrupted).
+
+        Parameters
+        ----------
+        source : np.array, str or iterable, optional
+            Commands source: an array (or memory-mapped file) with one command
+            per column, the path of a `.npy` file holding such an array (which
+            is memory-mapped), or an iterable (e.g. a generator) of commands.
+            Default is the uploaded command history.
+        interf : Interferometer, optional
+            Interferometer object to acquire the phase map. If None, the
+            surface of the mirror is yielded.
+        rebin : int
+            Rebinning factor for the acquired phase map.
+        modal : bool
+            If True, the command history is modal.
+        differential : bool
+            If True, the command history is applied differentially
+            to the initial shape.
+        delay : float
+            Delay, in seconds, between the command and the acquisition.
+
+        Yields
+        ------
+        i : int
+            Index of the command.
+        cmd : np.array
+            Command of the source.
+        phasemap : np.ma.MaskedArray
+            Acquired phase map (or mirror surface).
+        """
+        if source is None:
+            source = self.cmdHistory
+        if source is None:
+            raise Exception("No Command History to run!")
+        if isinstance(source, (str, os.PathLike)):
+            source = np.load(source, mmap_mode="r")
+        if isinstance(source, np.ndarray):
+            commands = (source[:, i] for i in range(source.shape[-1]))
+        else:
+            commands = iter(source)
+        s = self.get_shape()
+        try:
+            for i, cmd in enumerate(commands):
+                cmd = np.asarray(cmd)
+                self.set_shape(cmd + s if differential else cmd, modal=modal)
+                if interf is not None:
+                    time.sleep(delay)
+                    img = interf.acquire_phasemap(rebin=rebin)
+                else:
+                    img = np.ma.masked_array(self._shape.data.copy(), mask=self.mask)
+                yield i, cmd, img
+        finally:
+            # `s` holds actuator positions, already scaled: not via `set_shape`
+            self._mirror_command(s, False, False)
+
+    def _runPipelinedCmdHistory(
+        self, interf, write, rebin, modal, differential, delay, writers, progress
+    ):
+        """
+        Pipelined execution of the command history (see `runCmdHistory`).
+
+        A background thread computes the shapes in blocks, from the initial
+        state of the mirror; the calling thread applies them and acquires the
+        phase maps, which are saved by a bounded pool of writer threads.
+        """
+        n_frames = self.cmdHistory.shape[-1]
+        s = self.get_shape()
+        shape0 = self._shape.data[self._idx].copy()
+        # rebinned acquisitions only need the actuators positions
+        binned = interf is not None and _is_binning(rebin)
+
+        def _produce(block: int = 16):
+            for j in range(0, n_frames, block):
+                cmds = np.asarray(self.cmdHistory[:, j : j + block])
                 if differential:
-                    cmd = cmd + s
-                self.set_shape(cmd, modal=modal)
+                    cmds = cmds + s[:, None]
+                cmds = cmds * 1e-5  # same scaling as `set_shape`
+                if modal:
+                    cmds = np.dot(self.modal2zonal(), cmds)
+                if binned:
+                    for k in range(cmds.shape[1]):
+                        yield j + k, cmds[:, k], None
+                    continue
+                shapes = np.dot((cmds - s[:, None]).T.astype(self.dtype), self.IM)
+                shapes += shape0
+                for k in range(shapes.shape[0]):
+                    yield j + k, cmds[:, k], shapes[k]
+
+        with _pipe.WriterPool(writers, progress=progress, total=n_frames) as pool:
+            for i, cmd, shape in _pipe.background(_produce()):
+                if shape is None:
+                    self._mirror_command(cmd, False, False)
+                else:
+                    self._shape[self._idx] = shape
+                    self._actPos = cmd.copy()
+                    self.shapeVersion += 1
+                if self._live:
+                    from matplotlib import pyplot as plt
+
+                    time.sleep(0.15)
+                    plt.pause(0.05)
                 if interf is not None:
                     time.sleep(delay)
                     img = interf.acquire_phasemap(rebin=rebin)
-                    path = os.path.join(datafold, f"image_{i:05d}.fits")
-                    osu.save_fits(path, img)
-        self.set_shape(s)
-        return tn
+                    pool.submit(write, i, img)
+                else:
+                    progress(i + 1, n_frames)
 
     def visualize_shape(self, cmd=None):
         """
@@ -124,6 +386,8 @@ class AlpaoDm(BaseDeformableMirror):
         np.array
             Processed shape based on the command.
         """
+        from matplotlib import pyplot as plt
+
         if cmd is None:
             cmd = self._actPos.copy()
         plt.figure(figsize=(7, 6))
@@ -155,13 +419,13 @@ class AlpaoDm(BaseDeformableMirror):
             Processed shape based on the command.
         """
         if modal:
-            mode_img = np.dot(self.ZM, cmd)
-            cmd = np.dot(mode_img, self.RM)
+            cmd = np.dot(self.modal2zonal(), cmd)
         cmd_amp = cmd
         if not diff:
             cmd_amp = cmd - self._actPos
-        self._shape[self._idx] += np.dot(cmd_amp, self.IM)
+        self._pending += cmd_amp
         self._actPos += cmd_amp
+        self.shapeVersion += 1
 
     def _wavefront(self, **kwargs):
         """
@@ -190,7 +454,7 @@ class AlpaoDm(BaseDeformableMirror):
         noisy = kwargs.get("noisy", False)
         img = np.ma.masked_array(self._shape, mask=self.mask)
         if zernike is not None:
-            img = zern.removeZernike(img, zernike)
+            img = zern.removeZernike(img, zernike, dtype=self.dtype)
         if not surf:
             Ilambda = 632.8e-9
             phi = np.random.uniform(-0.25*np.pi, 0.25*np.pi) if noisy else 0
@@ -216,7 +480,7 @@ class AlpaoDm(BaseDeformableMirror):
                     fp.CONFIGURATION_ROOT_FOLDER, f"dm{self.nActs}_baseShape.fits"
                 )
             )
-            self._shape = np.ma.masked_array(shape)
+            self._shape = np.ma.masked_array(shape).astype(self.dtype)
         except FileNotFoundError:
             mat = np.eye(self.nActs)
             tx = mat[0]
@@ -234,3 +498,17 @@ class AlpaoDm(BaseDeformableMirror):
                 self._shape,
             )
             self._actPos = np.zeros(self.nActs)
+
+
+def _is_binning(rebin):
+    """
+    Whether a rebinning factor reduces the resolution by an integer factor.
+    """
+    return isinstance(rebin, (int, np.integer)) and rebin > 1
+
+
+def _print_progress(done: int, total: int):
+    """
+    Prints the progress of a command history execution.
+    """
+    print(f"{done}/{total}", end="\r", flush=True)
@@ -1,26 +1,76 @@
-import os
-from m4.configuration import update_folder_paths as ufp # type: ignore
-from alpao_simulator.ground.osutils import load_data_path
+"""
+Folder Paths
+============
+
+Description
+-----------
+Paths of the configuration files and of the data folders of the simulator.
 
-fn = ufp.folders
+The data folders depend on the configuration file (`BASE_PATH`) and on the
+`m4` package (`OPD_IMAGES_FOLDER`), so they are resolved lazily, the first
+time they are accessed, and not when the module is imported. The influence
+functions folder is created when it is first resolved.
+
+Example
+-------
+    >>> import alpao_simulator.folder_paths as fp
+    >>> fp.CONFIGURATION_FILE          # no side effects
+    >>> fp.INFLUENCE_FUNCTIONS_FOLDER  # reads the configuration, creates the folder
+"""
+
+import os
+import glob
 
 CONFIGURATION_FILE = os.path.join(os.path.dirname(__file__), 'sysconfig', 'configuration.conf')
 CONFIGURATION_ROOT_FOLDER = CONFIGURATION_FILE.replace('configuration.conf', '')
-BASE_PATH = load_data_path(CONFIGURATION_FILE)
-INFLUENCE_FUNCTIONS_FOLDER = os.path.join(BASE_PATH, 'influence_functions')
-if not os.path.exists(INFLUENCE_FUNCTIONS_FOLDER):
-    os.makedirs(INFLUENCE_FUNCTIONS_FOLDER)
 INTERF_CONF_FILE = os.path.join(CONFIGURATION_ROOT_FOLDER, 'InterfSettings.conf')
-OPD_IMAGES_FOLDER = fn.OPD_IMAGES_ROOT_FOLDER
 
-def INFLUENCE_FUNCTIONS_FILE(nacts):
-    return os.path.join(INFLUENCE_FUNCTIONS_FOLDER, f'dm{nacts}_iffCube.fits')
+def INFLUENCE_FUNCTIONS_FILE(nacts, key):
+    return os.path.join(_path('INFLUENCE_FUNCTIONS_FOLDER'), f'dm{nacts}_iffPacked_{key}.fits')
+
+def LEGACY_INFLUENCE_FUNCTIONS_FILE(nacts):
+    return os.path.join(_path('INFLUENCE_FUNCTIONS_FOLDER'), f'dm{nacts}_iffCube.fits')
+
+def DM_DATA_FILES(nacts):
+    """All the stored data of a DM, for any configuration, legacy ones included."""
+    return glob.glob(os.path.join(_path('INFLUENCE_FUNCTIONS_FOLDER'), f'dm{nacts}_*')) + \
+        glob.glob(os.path.join(_path('MATRIX_CACHE_FOLDER'), f'dm{nacts}_*'))
+
+
+def _base_path():
+    from alpao_simulator.ground.osutils import load_data_path
+    return load_data_path(CONFIGURATION_FILE)
+
+def _influence_functions_folder():
+    folder = os.path.join(_path('BASE_PATH'), 'influence_functions')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+def _matrix_cache_folder():
+    return os.path.join(_path('INFLUENCE_FUNCTIONS_FOLDER'), 'cache')
+
+def _m4_folders():
+    from m4.configuration import update_folder_paths as ufp # type: ignore
+    return ufp.folders
+
+def _opd_images_folder():
+    return _path('fn').OPD_IMAGES_ROOT_FOLDER
 
-def INTMAT_FILE(nacts):
-    return os.path.join(INFLUENCE_FUNCTIONS_FOLDER, f'dm{nacts}_intmat.fits')
+_LAZY = {
+    'BASE_PATH': _base_path,
+    'INFLUENCE_FUNCTIONS_FOLDER': _influence_functions_folder,
+    'MATRIX_CACHE_FOLDER': _matrix_cache_folder,
+    'fn': _m4_folders,
+    'OPD_IMAGES_FOLDER': _opd_images_folder,
+}
 
-def ZERNMAT_FILE(nacts):
-    return os.path.join(INFLUENCE_FUNCTIONS_FOLDER, f'dm{nacts}_zmat.fits')
+def _path(name):
+    """Returns a lazy path, resolving it at its first access."""
+    if name not in globals():
+        globals()[name] = _LAZY[name]()
+    return globals()[name]
 
-def RECMAT_FILE(nacts):
-    return os.path.join(INFLUENCE_FUNCTIONS_FOLDER, f'dm{nacts}_rmat.fits')
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return _path(name)
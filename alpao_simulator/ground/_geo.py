@@ -11,8 +11,13 @@ Description
 This module contains functions for geometric operations on images.
 """
 import numpy as np
-from skimage.measure import CircleModel
-from skimage.draw import disk
+import threading
+from collections import OrderedDict
+from alpao_simulator.ground.matrix_cache import content_key
+
+MEMO_SIZE = 16  # number of pupil coordinate grids kept in memory
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
 
 
 def qpupil_circle(image, pixel_dir=0):
@@ -24,29 +29,26 @@ def qpupil_circle(image, pixel_dir=0):
     pixel_dir: int
         indicates which direction to use for counting the number of pixels in the image.
         Y direction as standard
+
+    The coordinate grids are memoized per mask, and returned read-only.
     """
     aa = np.shape(image)
     imagePixels = aa[pixel_dir]  # standard dir y
+    mask = np.ma.getmaskarray(image)
+    key = content_key("circle", mask, pixel_dir)
+    grids = _recall(key)
+    if grids is not None:
+        return grids
+    from skimage.measure import CircleModel
+
     circ = CircleModel()
     cnt = _find_img_borders(image, imagePixels)
     circ.estimate(cnt)
     xc, yc, radius = np.array(circ.params, dtype=int)
-    maskedd = np.zeros((imagePixels, imagePixels), dtype=np.uint8)
-    rr, cc = disk((xc, yc), int(radius))
-    maskedd[rr, cc] = 1
-    idx = np.where(maskedd == 1)
-    ss = np.shape(maskedd)
-    x = np.arange(ss[0]).astype(float)
-    x = np.transpose(np.tile(x, [ss[1], 1]))
-    y = np.arange(ss[1]).astype(float)
-    y = np.tile(y, [ss[0], 1])
-    xx = x
-    yy = y
-    xx = xx - xc
-    xx = xx / radius
-    yy = yy - yc
-    yy = yy / radius
-    return xx, yy
+    x = np.arange(imagePixels, dtype=float)
+    xx = np.broadcast_to(((x - xc) / radius)[:, None], (imagePixels, imagePixels))
+    yy = np.broadcast_to(((x - yc) / radius)[None, :], (imagePixels, imagePixels))
+    return _store(key, (xx, yy))
 
 
 def qpupil(mask, xx=None, yy=None, nocircle=0):
@@ -60,60 +62,74 @@ def qpupil(mask, xx=None, yy=None, nocircle=0):
 
     Returns
     ------
-    x0:
-    y0:
-    r:
     xx: numpy array
-        grid of coordinates of the same size as input mask
+        grid of coordinates of the same size as input mask, read-only
     yy: numpy array
-        grid of coordinates of the same size as input mask
+        grid of coordinates of the same size as input mask, read-only
+
+    The coordinates are normalized on the bounding box of the pupil, and
+    memoized per mask.
     """
-    idx = np.where(mask == 1)
+    mask = np.asarray(mask)
+    key = content_key("qpupil", mask, nocircle)
+    grids = _recall(key)
+    if grids is not None:
+        return grids
     ss = np.shape(mask)
     x = np.arange(ss[0]).astype(float)
-    x = np.transpose(np.tile(x, [ss[1], 1]))
     y = np.arange(ss[1]).astype(float)
-    y = np.tile(y, [ss[0], 1])
-    xx = x
-    yy = y
-    x0 = 0
-    y0 = 0
-    r = 0
     if nocircle == 0:
-        maxv = max(xx[idx])
-        minv = min(xx[idx])
-        r1 = (maxv - minv) / 2
-        x0 = r1 + minv
-        xx = xx - (minv + maxv) / 2
-        xx = xx / ((maxv - minv) / 2)
-        mx = [minv, maxv]
-        maxv = max(yy[idx])
-        minv = min(yy[idx])
-        r2 = (maxv - minv) / 2
-        y0 = r2 + minv
-        yy = yy - (minv + maxv) / 2
-        yy = yy / ((maxv - minv) / 2)
-        r = np.mean([r1, r2])
-        my = [minv, maxv]
-    return xx, yy
+        pupil = mask == 1
+        rows = np.flatnonzero(np.any(pupil, axis=1))
+        cols = np.flatnonzero(np.any(pupil, axis=0))
+        minv, maxv = x[rows[0]], x[rows[-1]]
+        x = (x - (minv + maxv) / 2) / ((maxv - minv) / 2)
+        minv, maxv = y[cols[0]], y[cols[-1]]
+        y = (y - (minv + maxv) / 2) / ((maxv - minv) / 2)
+    xx = np.broadcast_to(x[:, None], ss)
+    yy = np.broadcast_to(y[None, :], ss)
+    return _store(key, (xx, yy))
 
 
 def _find_img_borders(image, imagePixels):
     """
     Function for...
     Created by Federico
+
+    Returns the first and last valid pixel of each of the first imagePixels
+    rows of the image having at least two valid pixels, as [row, column]
+    pairs.
+    """
+    valid = ~np.ma.getmaskarray(image)[:imagePixels]
+    rows = np.flatnonzero(np.count_nonzero(valid, axis=1) >= 2)
+    valid = valid[rows]
+    first = np.argmax(valid, axis=1)
+    last = valid.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    cut = np.empty((rows.size, 2, 2), dtype=int)
+    cut[:, :, 0] = rows[:, None]
+    cut[:, 0, 1] = first
+    cut[:, 1, 1] = last
+    return cut.reshape(-1, 2)
+
+
+def _recall(key):
+    """
+    Returns the memoized coordinate grids for a key, or None.
+    """
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            return _memo[key]
+    return None
+
+
+def _store(key, grids):
+    """
+    Memoizes the coordinate grids for a key, evicting the least recently
+    used ones beyond MEMO_SIZE.
     """
-    x = image
-    val = []
-    i = 0
-    while i < imagePixels:
-        a = x[i, :]
-        aa = np.where(a.mask.astype(int) == 0)
-        q = np.asarray(aa)
-        if q.size < 2:
-            i = i + 1
-        else:
-            val.append(np.array([[i, q[0, 0]], [i, q[0, q.size - 1]]]))
-            i = i + 1
-    cut = np.concatenate(val)
-    return cut
+    with _memo_lock:
+        _memo[key] = grids
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    return grids
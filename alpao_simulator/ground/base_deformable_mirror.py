@@ -1,31 +1,55 @@
 import os
 import numpy as np
-from tps import ThinPlateSpline
 from abc import ABC, abstractmethod
 import alpao_simulator.ground.zernike as zern
 import alpao_simulator.folder_paths as fp
 import alpao_simulator.ground.osutils as osu
+import alpao_simulator.ground.config_loader as cl
 import alpao_simulator.ground.geometry as geometry
+import alpao_simulator.ground.influence_functions as iff
+import alpao_simulator.ground.rebinning as rebinning
+from alpao_simulator.ground.packed_cube import PackedCube
+from alpao_simulator.ground.matrix_cache import MatrixCache, content_key
+from alpao_simulator.ground.reconstructor import Reconstructor
+
+# Default floating point precision of the DMs matrices and shapes
+DEFAULT_DTYPE = np.float64
 
 
 class BaseDeformableMirror(ABC):
     """
     Base class for deformable mirrors.
     """
-    def __init__(self, nActs: int):
+    def __init__(self, nActs: int, dtype=None):
         """
         Initializes the base deformable mirror with the number of actuators.
+
+        Parameters
+        ----------
+        nActs : int
+            Number of actuators of the DM.
+        dtype : data-type, optional
+            Floating point precision of the DM matrices and shapes, e.g.
+            `np.float32` to halve their memory and bandwidth. Default is
+            the module's `DEFAULT_DTYPE` (float64).
         """
         self.mirrorModes = None
         self.nActs = nActs
+        self.dtype = np.dtype(DEFAULT_DTYPE if dtype is None else dtype)
         self._pxScale = geometry.pixel_scale(self.nActs)
         self.actCoords = geometry.getDmCoordinates(self.nActs)
         self.mask = geometry.createMask(self.nActs)
         self._scaledActCoords = self._scaleActCoords()
-        self._iffCube = None
         self.IM = None
-        self.ZM = None
-        self.RM = None
+        self._iffCubeView = None
+        self._ZM = None
+        self._RM = None
+        self._reconstructor = None
+        self._recMethod = "svd"
+        self._rmKey = None
+        self._zmKey = None
+        self._m2c = {}
+        self._binnedIMs = {}
 
         print(" "*11+f"DM {self.nActs}\n")
         self._load_matrices()
@@ -65,107 +89,357 @@ class BaseDeformableMirror(ABC):
         raise NotImplementedError
     
 
+    @property
+    def RM(self):
+        """
+        Reconstruction matrix, built (or loaded) the first time it is accessed.
+        """
+        if self._RM is None:
+            self._create_rec_matrix()
+        return self._RM
+
+    @RM.setter
+    def RM(self, value):
+        self._RM = value
+        self._rmKey = None
+        self._m2c = {}
+
+
+    @property
+    def recMethod(self):
+        """
+        Method of the interaction matrix decomposition (see
+        `ground.reconstructor`): 'svd' (default), for which RM is the exact
+        pseudo-inverse of IM, or 'gram', faster, through the normal equations.
+        Changing it discards the reconstruction matrices built so far.
+        """
+        return self._recMethod
+
+    @recMethod.setter
+    def recMethod(self, value):
+        if value not in ("svd", "gram"):
+            raise ValueError(f"Unknown decomposition method '{value}'")
+        if value != self._recMethod:
+            self._recMethod = value
+            self._reconstructor = None
+            self.RM = None
+
+
+    @property
+    def reconstructor(self):
+        """
+        Reconstructor of the DM (see `ground.reconstructor`), holding the cached
+        thin SVD of the interaction matrix, from which truncated or regularized
+        reconstruction matrices are derived without recomputing it.
+        """
+        if self._reconstructor is None:
+            self._create_reconstructor()
+        return self._reconstructor
+
+
+    @property
+    def ZM(self):
+        """
+        Zernike matrix, built (or loaded) the first time it is accessed.
+        """
+        if self._ZM is None:
+            self._create_zernike_matrix()
+        return self._ZM
+
+    @ZM.setter
+    def ZM(self, value):
+        self._ZM = value
+        self._zmKey = None
+        self._m2c = {}
+
+
+    @property
+    def _iffCube(self):
+        """
+        Lazy cube view of the influence functions, built on the interaction
+        matrix the first time it is accessed.
+        """
+        if self._iffCubeView is None:
+            self._iffCubeView = PackedCube(self.IM.T, self.mask)
+        return self._iffCubeView
+
+    @_iffCube.setter
+    def _iffCube(self, value):
+        self._iffCubeView = value
+
+
+    def modal2zonal(self, modes=None):
+        """
+        Returns the modal-to-zonal command matrix, RM^T ZM, which converts
+        a modal command into the zonal one in a single small product.
+
+        The matrix is cached for each mode set, in memory and in the matrix
+        cache.
+
+        Parameters
+        ----------
+        modes : array_like, optional
+            Zernike modes (starting from 1) of the modal commands, i.e. the
+            columns of ZM to use. Default is all the modes of ZM.
+
+        Returns
+        -------
+        np.ndarray
+            Modal-to-zonal command matrix, of shape (nActs, nModes).
+        """
+        if modes is None:
+            modes = tuple(range(1, self.ZM.shape[1] + 1))
+        else:
+            modes = tuple(int(m) for m in np.atleast_1d(modes))
+        if modes not in self._m2c:
+            idx = np.array(modes) - 1
+            name = None
+            if self._rmKey is not None and self._zmKey is not None:
+                key = content_key("m2c", self._rmKey, self._zmKey, modes, self.dtype.str)
+                name = f"dm{self.nActs}_m2c_{key}"
+            if name is not None and self._cache.exists(name):
+                m2c = self._cache.load(name)
+            else:
+                m2c = np.asarray(self.RM).T @ np.asarray(self.ZM)[:, idx]
+                if name is not None:
+                    m2c = self._cache.save(name, m2c)
+            self._m2c[modes] = m2c
+        return self._m2c[modes]
+
+
+    def binnedIM(self, rebin: int):
+        """
+        Returns the interaction matrix rebinned by a factor, with its bin map.
+
+        Rebinning is linear, so the rebinned surface produced by a command is
+        the command times the rebinned interaction matrix: rebinned surfaces
+        cost a single product at the reduced resolution. The matrix is cached
+        for each factor, in memory and in the matrix cache.
+
+        Parameters
+        ----------
+        rebin : int
+            Rebinning factor.
+
+        Returns
+        -------
+        IM : np.ndarray
+            Rebinned interaction matrix, of shape (nActs, nbins), on the valid
+            bins of the rebinned mask.
+        bmap : BinMap
+            Bin map of the mask, holding the rebinned mask (see
+            `ground.rebinning`).
+        """
+        rebin = int(rebin)
+        if rebin not in self._binnedIMs:
+            bmap = rebinning.bin_map(self.mask, rebin)
+            name = f"dm{self.nActs}_intmat_bin{rebin}_{self._iffKey}"
+            if not self._cache.exists(name):
+                IM = self._cache.load(self._imName)
+                self._cache.save(name, bmap.rebin(IM.T).T)
+            self._binnedIMs[rebin] = (self._load_typed(name), bmap)
+        return self._binnedIMs[rebin]
+
+
     def _load_matrices(self):
         """
         Loads the required matrices for the deformable mirror's operations.
+
+        The matrices are kept in a memory-mapped cache (see `ground.matrix_cache`),
+        so that they are opened read-only and zero-copy after the first time.
+        Each matrix is stored under a key hashed from the geometry and the
+        parameters it is derived from, so that a change in the configuration
+        never loads stale matrices, only the invalidated ones are rebuilt, and
+        the variants for different configurations coexist.
+
+        Only the interaction matrix is loaded here: the reconstruction and
+        Zernike matrices are built the first time they are accessed (see
+        the `RM` and `ZM` properties), so zonal sessions never pay for them.
         """
-        if not os.path.exists(fp.INFLUENCE_FUNCTIONS_FILE(self.nActs)):
-            print(f"First time simulating DM {self.nActs}. Generating influence functions...")
-            self._simulate_Zonal_Iff_Acquisition()
-        else:
-            print(f"Loaded influence functions.")
-            self._iffCube = np.ma.masked_array(osu.load_fits(fp.INFLUENCE_FUNCTIONS_FILE(self.nActs)))
-        self._create_int_and_rec_matrices()
-        self._create_zernike_matrix()
+        self._cache = MatrixCache(fp.MATRIX_CACHE_FOLDER)
+        self._iffKey = content_key(
+            "iff", iff.KERNEL, self.nActs, self._scaledActCoords, self.mask
+        )
+        self._create_int_matrix()
 
     
     def _create_zernike_matrix(self):
         """
         Create the Zernike matrix for the DM.
         """
-        if not os.path.exists(fp.ZERNMAT_FILE(self.nActs)):
-            n_zern = self.nActs
-            print("Computing Zernike matrix...")
-            self.ZM = zern.generate_zernike_matrix(n_zern, self.mask)
-            osu.save_fits(fp.ZERNMAT_FILE(self.nActs), self.ZM)
-        else:
+        modes = np.arange(1, self.nActs + 1)
+        key = content_key("zmat", modes, self.mask)
+        name = f"dm{self.nActs}_zmat_{key}"
+        if self._cache.exists(name):
             print(f"Loaded Zernike matrix.")
-            self.ZM = osu.load_fits(fp.ZERNMAT_FILE(self.nActs))
+        else:
+            print("Computing Zernike matrix...")
+            self._cache.save(name, zern.generate_zernike_matrix(modes, self.mask))
+        self._ZM = self._load_typed(name)
+        self._zmKey = key
 
 
-    def _create_int_and_rec_matrices(self):
+    def _create_int_matrix(self):
         """
-        Create the interaction matrices for the DM.
+        Create the interaction matrix for the DM.
         """
-        if not os.path.exists(fp.INTMAT_FILE(self.nActs)):
-            print("Computing interaction matrix...")
-            self.IM = np.array(
-                [
-                    (self._iffCube[:, :, i].data)[self.mask == 0]
-                    for i in range(self._iffCube.shape[2])
-                ]
-            )
-            osu.save_fits(fp.INTMAT_FILE(self.nActs), self.IM)
+        name = f"dm{self.nActs}_intmat_{self._iffKey}"
+        if self._cache.exists(name):
+            print(f"Loaded influence functions.")
         else:
-            print(f"Loaded interaction matrix.")
-            self.IM = osu.load_fits(fp.INTMAT_FILE(self.nActs))
-        if not os.path.exists(fp.RECMAT_FILE(self.nActs)):
-            print("Computing reconstruction matrix...")
-            self.RM = np.linalg.pinv(self.IM)
-            osu.save_fits(fp.RECMAT_FILE(self.nActs), self.RM)
+            self._load_iff_cube()
+            # The packed influence functions are the interaction matrix
+            self._cache.save(name, self._iffCube.data.T)
+        self._imName = name
+        self.IM = self._load_typed(name)
+        self._iffCube = None
+
+
+    def _create_reconstructor(self):
+        """
+        Create the reconstructor for the DM, loading the decomposition of the
+        interaction matrix from the cache if available.
+        """
+        # The decomposition is always computed on the float64 matrix
+        IM = self._cache.load(self._imName)
+        key = content_key("svd", self._iffKey, self._recMethod)
+        u_name, s_name = f"dm{self.nActs}_svdU_{key}", f"dm{self.nActs}_svdS_{key}"
+        if self._cache.exists(u_name) and self._cache.exists(s_name):
+            U, S = self._cache.load(u_name), self._cache.load(s_name)
+            self._reconstructor = Reconstructor(IM, self._recMethod, U, S)
         else:
+            print("Computing interaction matrix decomposition...")
+            self._reconstructor = Reconstructor(IM, self._recMethod)
+            self._cache.save(u_name, self._reconstructor.U)
+            self._cache.save(s_name, self._reconstructor.s)
+
+
+    def _create_rec_matrix(self):
+        """
+        Create the reconstruction matrix for the DM.
+        """
+        method = "pinv" if self._recMethod == "svd" else self._recMethod
+        key = content_key("rmat", self._iffKey, method)
+        name = f"dm{self.nActs}_rmat_{key}"
+        if self._cache.exists(name):
             print(f"Loaded reconstruction matrix.")
-            self.RM = osu.load_fits(fp.RECMAT_FILE(self.nActs))
+        else:
+            print("Computing reconstruction matrix...")
+            if self._recMethod == "svd":
+                # the exact pseudo-inverse
+                IM = self._cache.load(self._imName)
+                self._cache.save(name, np.linalg.pinv(IM))
+            else:
+                self._cache.save(name, self.reconstructor.matrix())
+        self._RM = self._load_typed(name)
+        self._rmKey = key
+
+
+    def _load_typed(self, name: str):
+        """
+        Loads a cached matrix in the DM precision. Matrices are computed and
+        cached in float64, and their conversion is cached too, so that it is
+        loaded zero-copy as well.
+        """
+        if self.dtype == np.float64:
+            return self._cache.load(name)
+        typed = f"{name}_{self.dtype.name}"
+        if not self._cache.exists(typed):
+            self._cache.save(typed, self._cache.load(name).astype(self.dtype))
+        return self._cache.load(typed)
+
+
+    def _load_iff_cube(self):
+        """
+        Loads the influence functions cube, generating it if it does not exist
+        for the current configuration.
+        """
+        iff_file = fp.INFLUENCE_FUNCTIONS_FILE(self.nActs, self._iffKey)
+        legacy_file = fp.LEGACY_INFLUENCE_FUNCTIONS_FILE(self.nActs)
+        if os.path.exists(iff_file):
+            print(f"Loaded influence functions.")
+            self._iffCube = osu.load_packed_fits(iff_file)
+            return
+        if os.path.exists(legacy_file):
+            cube = osu.load_fits(legacy_file)
+            # Legacy cubes are not keyed: check at least the mask and actuators
+            if cube.shape[2] == self.nActs and np.array_equal(
+                np.ma.getmaskarray(cube)[:, :, 0], self.mask
+            ):
+                print(f"Converting influence functions to the packed format...")
+                self._iffCube = PackedCube(
+                    np.asarray(cube.data, dtype=float)[self.mask == 0], self.mask
+                )
+                osu.save_packed_fits(iff_file, self._iffCube)
+                return
+            print(f"Legacy influence functions do not match the configuration.")
+        print(f"First time simulating DM {self.nActs}. Generating influence functions...")
+        self._simulate_Zonal_Iff_Acquisition()
 
 
 
-    def _simulate_Zonal_Iff_Acquisition(self):
+    def _simulate_Zonal_Iff_Acquisition(self, mode: str = "factorized"):
         """
         Simulate the influence functions by imposing 'perfect' zonal commands.
         
         Parameters
         ----------
-        amps : float or np.ndarray, optional
-            Amplitude(s) for the actuator commands. If a single float is provided,
-            it is applied to all actuators. Default is 1.0.
+        mode : str, optional
+            Generation mode of the influence functions:
+            - 'factorized' : the TPS system is factorized once and solved for
+              all the actuators at once, sharing the pixel kernel matrix, which
+              is evaluated on the valid pixels only, in blocks fitting the
+              `mem_budget` of the configuration file, distributed over its
+              `workers` processes (see `ground.influence_functions`). Default.
+            - 'per_actuator' : one ThinPlateSpline is fitted and evaluated for
+              each actuator.
             
         Returns
         -------
-        np.ma.MaskedArray
-            A masked cube of influence functions with shape (height, width, nActs).
+        PackedCube
+            A lazy masked cube of influence functions with shape (height, width, nActs),
+            storing only the valid pixels.
         """
         # Get the number of actuators from the coordinates array.
         n_acts = self.actCoords.shape[1]
         max_x, max_y = self.mask.shape
-        # Create pixel grid coordinates.
-        pix_coords = np.zeros((max_x * max_y, 2))
-        pix_coords[:, 0] = np.repeat(np.arange(max_x), max_y)
-        pix_coords[:, 1] = np.tile(np.arange(max_y), max_x)
         # Convert actuator coordinates to pixel coordinates.
-        # Note: self.coords is of shape (2, nActs) where first row is x and second is y.
-        act_coords = self.actCoords.T  # shape: (n_acts, 2)
-        act_pix_coords = np.zeros((n_acts, 2), dtype=int)
-        act_pix_coords[:, 0] = (act_coords[:, 1] / np.max(act_coords[:, 1])*max_x).astype(int)
-        act_pix_coords[:, 1] = (act_coords[:, 0] / np.max(act_coords[:, 0])*max_y).astype(int)  # corrected to use act_coords[:, 0]
-        # Prepare an image cube to store the influence functions.
-        img_cube = np.zeros((max_x, max_y, n_acts))
-        amps = np.ones(n_acts)
-        # For each actuator, compute the influence function with a TPS interpolation.
-        for k in range(n_acts):
-            print(f"{k+1}/{n_acts}", end='\r', flush=True)
-            # Create a command vector with a single nonzero element.
-            act_data = np.zeros(n_acts)
-            act_data[k] = amps[k]
-            tps = ThinPlateSpline(alpha=0.0)
-            tps.fit(act_pix_coords, act_data)
-            flat_img = tps.transform(pix_coords)
-            img_cube[:, :, k] = flat_img.reshape((max_x, max_y))
-        # Create a cube mask that tiles the local mirror mask for each actuator.
-        cube_mask = np.tile(self.mask, n_acts).reshape(img_cube.shape, order='F')
-        cube = np.ma.masked_array(img_cube, mask=cube_mask)
-        # Save the cube to a FITS file.
-        fits_file = fp.INFLUENCE_FUNCTIONS_FILE(self.nActs)
-        osu.save_fits(fits_file, cube)
+        act_pix_coords = self._scaleActCoords()
+        if mode == "factorized":
+            iff_conf = cl.load_iff_configuration()
+            packed = iff.generate_zonal_iffs(
+                act_pix_coords,
+                self.mask,
+                mem_budget=iff_conf["mem_budget"],
+                workers=iff_conf["workers"],
+            )
+        elif mode == "per_actuator":
+            from tps import ThinPlateSpline
+
+            # Create pixel grid coordinates.
+            pix_coords = np.zeros((max_x * max_y, 2))
+            pix_coords[:, 0] = np.repeat(np.arange(max_x), max_y)
+            pix_coords[:, 1] = np.tile(np.arange(max_y), max_x)
+            # Prepare an image cube to store the influence functions.
+            img_cube = np.zeros((max_x, max_y, n_acts))
+            amps = np.ones(n_acts)
+            # For each actuator, compute the influence function with a TPS interpolation.
+            for k in range(n_acts):
+                print(f"{k+1}/{n_acts}", end='\r', flush=True)
+                # Create a command vector with a single nonzero element.
+                act_data = np.zeros(n_acts)
+                act_data[k] = amps[k]
+                tps = ThinPlateSpline(alpha=0.0)
+                tps.fit(act_pix_coords, act_data)
+                flat_img = tps.transform(pix_coords)
+                img_cube[:, :, k] = flat_img.reshape((max_x, max_y))
+            packed = img_cube[self.mask == 0]
+        else:
+            raise ValueError(f"Unknown influence functions generation mode '{mode}'")
+        cube = PackedCube(packed, self.mask)
+        # Save the packed cube to a FITS file.
+        fits_file = fp.INFLUENCE_FUNCTIONS_FILE(self.nActs, self._iffKey)
+        osu.save_packed_fits(fits_file, cube)
         self._iffCube = cube
 
     def _scaleActCoords(self):
@@ -1,46 +1,263 @@
+"""
+Configuration Loader
+====================
+
+Description
+-----------
+This module reads the configuration files of the simulator. Each file is
+parsed once, and parsed again only when its modification time changes, and
+its sections are converted into immutable typed records:
+
+    - `DmConfig`: geometry of a DM, from the `[DM<nacts>]` sections of
+      `configuration.conf`;
+    - `InterfConfig`: camera settings of an interferometer, from
+      `InterfSettings.conf`.
+
+Records compare equal when their content is the same, so they can be used as
+keys to memoize the quantities derived from them (see `geometry`). The
+`load_*_configuration` functions return the raw sections, as read-only
+mappings of strings.
+
+Example
+-------
+    >>> dm = dm_config(88)
+    >>> dm.coords, dm.pixel_scale
+    ((6, 8, 10), 102.4)
+    >>> interf_config('4DAccuFiz').full_width
+    1024
+"""
+
+import os
+import ast
+import threading
+from types import MappingProxyType
+from dataclasses import dataclass
 from configparser import ConfigParser
 import alpao_simulator.folder_paths as fp
 
+_parsed = {}
+_records = {}
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class DmConfig:
+    """
+    Geometry of a DM.
+    """
+
+    nActs: int
+    coords: tuple
+    opt_diameter: float
+    pixel_scale: float
+    act_px_size: float
+    act_mm_size: float
+
+
+@dataclass(frozen=True)
+class InterfConfig:
+    """
+    Camera settings of an interferometer.
+    """
+
+    name: str
+    width: int
+    height: int
+    full_width: int
+    full_height: int
+    x_offset: int
+    y_offset: int
+
+
+def dm_config(Nacts: int):
+    """
+    Returns the configuration of the DM with the given number of actuators.
+
+    Parameters
+    ----------
+    Nacts : int
+        Total number of actuators in the DM.
+
+    Returns
+    -------
+    DmConfig
+        Configuration of the DM.
+    """
+    return _record(
+        fp.CONFIGURATION_FILE, f"DM{Nacts}", _dm_record,
+        f"No configuration found for {Nacts} actuators",
+    )
+
+
+def interf_config(name: str):
+    """
+    Returns the configuration of an interferometer.
+
+    Parameters
+    ----------
+    name : str
+        Name of the interferometer.
+
+    Returns
+    -------
+    InterfConfig
+        Configuration of the interferometer.
+    """
+    return _record(
+        fp.INTERF_CONF_FILE, name, _interf_record,
+        f"No configuration found for {name} interferometer",
+    )
+
 
 def load_dm_configuration(Nacts: int):
     """
     Loads the DM configuration for a given number of actuators.
-    
+
     Parameters
     ----------
     Nacts : int
         Total number of actuators in the DM.
-    
+
     Returns
     -------
     dict
         Dictionary containing the DM configuration.
     """
-    _dmReader = ConfigParser()
-    _dmReader.read(fp.CONFIGURATION_FILE)
-    section_name = f'DM{Nacts}'
-    if section_name in _dmReader:
-        return _dmReader[section_name]
-    else:
+    section = _section(fp.CONFIGURATION_FILE, f'DM{Nacts}')
+    if section is None:
         raise ValueError(f"No configuration found for {Nacts} actuators")
+    return section
 
 def load_interf_configuration(name:str):
     """
     Loads the interferometer configuration.
-    
+
     Parameters
     ----------
     name : str
         Name of the interferometer.
-    
+
     Returns
     -------
     dict
         Dictionary containing the interferometer configuration.
     """
-    _interfReader = ConfigParser()
-    _interfReader.read(fp.INTERF_CONF_FILE)
-    if name in _interfReader:
-        return _interfReader[name]
-    else:
-        raise ValueError(f"No configuration found for {name} interferometer")
\ No newline at end of file
+    section = _section(fp.INTERF_CONF_FILE, name)
+    if section is None:
+        raise ValueError(f"No configuration found for {name} interferometer")
+    return section
+
+def load_iff_configuration():
+    """
+    Loads the influence functions generation configuration.
+
+    Returns
+    -------
+    dict
+        Dictionary containing the influence functions generation configuration.
+        Missing entries are set to their default values.
+    """
+    config = {"mem_budget": 1024.0, "workers": 1}
+    section = _section(fp.CONFIGURATION_FILE, "IFF")
+    if section is not None:
+        config["mem_budget"] = float(section.get("mem_budget", config["mem_budget"]))
+        config["workers"] = int(section.get("workers", config["workers"]))
+    return config
+
+def reload():
+    """
+    Forgets all the parsed configurations, so that the files are read again
+    at the next access even if their modification time did not change.
+    """
+    with _lock:
+        _parsed.clear()
+        _records.clear()
+
+
+def _parse(path: str):
+    """
+    Parses a configuration file, unless it has already been parsed and has
+    not been modified since.
+
+    Returns
+    -------
+    tuple
+        Modification time of the file and its sections, as read-only
+        mappings of strings.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    with _lock:
+        cached = _parsed.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached
+        reader = ConfigParser()
+        reader.read(path)
+        sections = {
+            name: MappingProxyType(dict(reader[name])) for name in reader.sections()
+        }
+        cached = (mtime, sections)
+        _parsed[path] = cached
+        return cached
+
+
+def _section(path: str, name: str):
+    """
+    Returns a section of a configuration file, or None if it is missing.
+    """
+    return _parse(path)[1].get(name)
+
+
+def _record(path: str, name: str, build, missing: str):
+    """
+    Returns the typed record of a section of a configuration file, built
+    again only when the file is modified.
+    """
+    mtime, sections = _parse(path)
+    key = (path, name)
+    with _lock:
+        cached = _records.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    if name not in sections:
+        raise ValueError(missing)
+    record = build(name, sections[name])
+    with _lock:
+        _records[key] = (mtime, record)
+    return record
+
+
+def _dm_record(name: str, section):
+    """
+    Builds the configuration record of a DM.
+    """
+    coords = ast.literal_eval(section["coords"])
+    if not isinstance(coords, (list, tuple)) or not all(
+        isinstance(c, int) for c in coords
+    ):
+        raise ValueError(f"Invalid actuator coordinates for {name}: {section['coords']}")
+    return DmConfig(
+        nActs=int(name[2:]),
+        coords=tuple(coords),
+        opt_diameter=float(section["opt_diameter"]),
+        pixel_scale=float(section["pixel_scale"]),
+        act_px_size=float(section["act_px_size"]),
+        act_mm_size=float(section["act_mm_size"]),
+    )
+
+
+def _interf_record(name: str, section):
+    """
+    Builds the configuration record of an interferometer.
+    """
+    return InterfConfig(
+        name=name,
+        width=int(section["width"]),
+        height=int(section["height"]),
+        full_width=int(section["full_width"]),
+        full_height=int(section["full_height"]),
+        x_offset=int(section["x-offset"]),
+        y_offset=int(section["y-offset"]),
+    )
@@ -0,0 +1,199 @@
+"""
+Frame Store
+===========
+
+Description
+-----------
+This module provides the `FrameStore` class, a single container into which
+the frames of an acquisition are streamed, instead of one FITS file each.
+
+The frames share a single mask, so only their valid pixels are stored, packed
+in a pre-sized memory-mapped `.npy` array of shape (nframes, npix). The folder
+of a store contains:
+
+    - `frames.npy`: packed frames, one per row;
+    - `mask.npy`: the mask shared by all the frames;
+    - `commands.npy`: the commands which produced the frames, one per column
+      (optional);
+    - `info.json`: number of frames written and acquisition metadata.
+
+A store is read back with `load_frames`, as a lazy masked cube with random
+access by frame, whose data is memory-mapped.
+
+Example
+-------
+    >>> store = FrameStore(folder, n_frames=100, commands=cmdHistory)
+    >>> for i in range(100):
+    ...     store.write(i, interf.acquire_phasemap())
+    >>> store.close()
+    >>> cube = load_frames(folder)
+    >>> img = cube[:, :, 42]
+"""
+
+import os
+import json
+import threading
+import numpy as np
+from alpao_simulator.ground.packed_cube import PackedCube
+
+FRAMES_FILE = "frames.npy"
+MASK_FILE = "mask.npy"
+COMMANDS_FILE = "commands.npy"
+INFO_FILE = "info.json"
+
+
+class FrameStore:
+    """
+    Pre-sized, appendable single container of masked frames sharing a mask.
+    """
+
+    def __init__(self, folder: str, n_frames: int, commands=None, info: dict = None):
+        """
+        Parameters
+        ----------
+        folder : str
+            Folder of the store. Created if it does not exist.
+        n_frames : int
+            Number of frames of the store.
+        commands : np.ndarray, optional
+            Commands producing the frames, one per column.
+        info : dict, optional
+            Acquisition metadata, saved in the index of the store.
+        """
+        self.folder = folder
+        self.nFrames = n_frames
+        self.info = dict(info or {})
+        self.mask = None
+        self._frames = None
+        self._written = np.zeros(n_frames, dtype=bool)
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        if commands is not None:
+            np.save(os.path.join(folder, COMMANDS_FILE), np.asarray(commands))
+
+    def write(self, i: int, img):
+        """
+        Writes a frame into the store. The mask of the first frame written
+        becomes the mask of the store. Distinct frames can be written
+        concurrently from different threads.
+
+        Parameters
+        ----------
+        i : int
+            Index of the frame.
+        img : np.ma.MaskedArray
+            Frame to be written.
+        """
+        mask = np.ma.getmaskarray(img)
+        with self._lock:
+            if self._frames is None:
+                self._create(mask, np.asarray(img).dtype)
+        if mask.shape != self.mask.shape or not np.array_equal(mask, self.mask):
+            raise ValueError(f"Frame {i} does not share the mask of the store")
+        self._frames[i] = np.ma.getdata(img)[~self.mask]
+        self._written[i] = True
+
+    def append(self, img):
+        """
+        Writes a frame after the last one written.
+
+        Parameters
+        ----------
+        img : np.ma.MaskedArray
+            Frame to be written.
+        """
+        written = np.flatnonzero(self._written)
+        self.write(written[-1] + 1 if written.size else 0, img)
+
+    def close(self):
+        """
+        Flushes the frames to disk and writes the index of the store.
+        """
+        if self._frames is not None:
+            self._frames.flush()
+        self.info["n_frames"] = self.nFrames
+        self.info["n_written"] = int(self._written.sum())
+        with open(os.path.join(self.folder, INFO_FILE), "w") as f:
+            json.dump(self.info, f, indent=4)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _create(self, mask, dtype):
+        """
+        Creates the pre-sized frames file, on the mask of the first frame.
+        """
+        self.mask = mask.copy()
+        np.save(os.path.join(self.folder, MASK_FILE), self.mask)
+        self._frames = np.lib.format.open_memmap(
+            os.path.join(self.folder, FRAMES_FILE),
+            mode="w+",
+            dtype=dtype,
+            shape=(self.nFrames, int(np.sum(~self.mask))),
+        )
+
+
+def load_frames(folder: str, mmap_mode: str = "r"):
+    """
+    Loads the frames of a store, as a lazy masked cube.
+
+    Parameters
+    ----------
+    folder : str
+        Folder of the store.
+    mmap_mode : str, optional
+        Memory-map mode of the frames: 'r' (default, read-only) or 'r+', to
+        modify them in place (e.g. with `zernike.removeZernikeCube`).
+
+    Returns
+    -------
+    PackedCube
+        Lazy cube of the frames, of shape (height, width, nframes), reading
+        from disk only the accessed frames.
+    """
+    path = os.path.join(folder, FRAMES_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No frames were written in the store {folder}")
+    frames = np.load(path, mmap_mode=mmap_mode)
+    mask = np.load(os.path.join(folder, MASK_FILE))
+    return PackedCube(frames.T, mask)
+
+
+def load_commands(folder: str):
+    """
+    Loads the commands which produced the frames of a store.
+
+    Parameters
+    ----------
+    folder : str
+        Folder of the store.
+
+    Returns
+    -------
+    np.ndarray or None
+        Commands, one per column, or None if they were not saved.
+    """
+    path = os.path.join(folder, COMMANDS_FILE)
+    return np.load(path, mmap_mode="r") if os.path.exists(path) else None
+
+
+def load_info(folder: str):
+    """
+    Loads the index of a store.
+
+    Parameters
+    ----------
+    folder : str
+        Folder of the store.
+
+    Returns
+    -------
+    dict
+        Number of frames written and acquisition metadata.
+    """
+    with open(os.path.join(folder, INFO_FILE)) as f:
+        return json.load(f)
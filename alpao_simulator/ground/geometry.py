@@ -1,9 +1,13 @@
 import numpy as np
+from functools import lru_cache
 import alpao_simulator.ground.config_loader as cl
+import alpao_simulator.ground.rebinning as _rebin
 
 def getDmCoordinates(Nacts: int):
     """
     Generates the coordinates of the DM actuators for a given DM size and actuator sequence.
+
+    The coordinates are memoized per DM configuration.
     
     Parameters
     ----------
@@ -15,49 +19,27 @@ def getDmCoordinates(Nacts: int):
     np.array
         Array of coordinates of the actuators.
     """
-    dms = cl.load_dm_configuration(Nacts)
-    nacts_row_sequence = eval(dms['coords'])
-    n_dim = nacts_row_sequence[-1]
-    upper_rows = nacts_row_sequence[:-1]
-    lower_rows = [l for l in reversed(upper_rows)]
-    center_rows = [n_dim] * upper_rows[0]
-    rows_number_of_acts = upper_rows + center_rows + lower_rows
-    n_rows = len(rows_number_of_acts)
-    cx = np.array([], dtype=int)
-    cy = np.array([], dtype=int)
-    for i in range(n_rows):
-        cx = np.concatenate((cx, np.arange(rows_number_of_acts[i]) + (n_dim - rows_number_of_acts[i]) // 2))
-        cy = np.concatenate((cy, np.full(rows_number_of_acts[i], i)))
-    coords = np.array([cx, cy])
-    return coords
+    return _dm_coordinates(cl.dm_config(Nacts)).copy()
 
 def createMask(nActs: int, shape=(512, 512)):
     """
     Generates a circular mask for a mirror based on its optical diameter and pixel scale.
+
+    The mask is memoized per DM configuration and shape.
     
     Parameters
     ----------
-    opt_diameter : float
-        The mirror's diameter in millimeters.
-    pixel_scale : float
-        Scale in pixels per millimeter.
+    nActs : int
+        Total number of actuators in the DM.
     shape : tuple, optional
         The shape of the output mask (height, width), by default (512, 512).
     
     Returns
     -------
     np.ndarray
-        A boolean array of the given shape. True values represent the mirror area.
+        A boolean array of the given shape. False values represent the mirror area.
     """
-    dm = cl.load_dm_configuration(nActs)
-    opt_diameter = float(dm['opt_diameter'])
-    pixel_scale = float(dm['pixel_scale'])
-    height, width = shape
-    cx, cy = width / 2, height / 2
-    radius = (opt_diameter * pixel_scale) / 2  # radius in pixels
-    y, x = np.ogrid[:height, :width]
-    mask = (x - cx) ** 2 + (y - cy) ** 2 >= radius ** 2
-    return mask
+    return _dm_mask(cl.dm_config(nActs), tuple(shape)).copy()
 
 def rebinned(img, rebin:int=1, sample:bool=False):
     """
@@ -65,6 +47,9 @@ def rebinned(img, rebin:int=1, sample:bool=False):
 
     Replacement of IDL's rebin() function for 2d arrays.
     Resizes a 2d array by averaging or repeating elements.
+    Masked images are averaged over the valid pixels of each bin only, with
+    the bin maps of `rebinning`, and a bin is masked if it has no valid
+    pixels.
     New dimensions must be integral factors of original dimensions,
     otherwise a ValueError exception will be raised.
 
@@ -118,10 +103,10 @@ def rebinned(img, rebin:int=1, sample:bool=False):
     if a.shape == (m, n):
         return a
     M, N = a.shape
-    if m <= M and n <= M:
+    if m <= M and n <= N:
         if (M // m != M / m) or (N // n != N / n):
             raise ValueError("Cannot downsample by non-integer factors")
-    elif M <= m and M <= m:
+    elif m >= M and n >= N:
         if (m // M != m / M) or (n // N != n / N):
             raise ValueError("Cannot upsample by non-integer factors")
     else:
@@ -134,9 +119,11 @@ def rebinned(img, rebin:int=1, sample:bool=False):
         return a[tuple(idx)]
     else:
         if m <= M and n <= N:
+            if np.ma.isMaskedArray(a) and np.ma.getmask(a) is not np.ma.nomask:
+                return _rebin.bin_map(a.mask, M // m).rebin_image(a)
             return a.reshape((m, M // m, n, N // n)).mean(3).mean(1)
-        elif m >= M and n >= M:
-            return np.repeat(np.repeat(a, m / M, axis=0), n / N, axis=1)
+        else:
+            return np.repeat(np.repeat(a, m // M, axis=0), n // N, axis=1)
 
 
 def pixel_scale(nacts:int):
@@ -153,12 +140,42 @@ def pixel_scale(nacts:int):
     float
         Pixel scale of the DM.
     """
-    dm = cl.load_dm_configuration(nacts)
-    return float(dm['pixel_scale'])
+    return cl.dm_config(nacts).pixel_scale
 
 
 def rms(image):
     """
     Function which returns the Root Mean Square of the input image.
     """
-    return np.sqrt(np.mean(image**2))
\ No newline at end of file
+    return np.sqrt(np.mean(image**2))
+
+
+@lru_cache(maxsize=8)
+def _dm_coordinates(dm):
+    """
+    Actuator coordinates of a DM configuration.
+    """
+    n_dim = dm.coords[-1]
+    upper_rows = list(dm.coords[:-1])
+    lower_rows = upper_rows[::-1]
+    center_rows = [n_dim] * upper_rows[0]
+    rows_number_of_acts = np.array(upper_rows + center_rows + lower_rows)
+    cx = np.concatenate([np.arange(n) + (n_dim - n) // 2 for n in rows_number_of_acts])
+    cy = np.repeat(np.arange(rows_number_of_acts.size), rows_number_of_acts)
+    coords = np.array([cx, cy])
+    coords.flags.writeable = False
+    return coords
+
+
+@lru_cache(maxsize=8)
+def _dm_mask(dm, shape):
+    """
+    Circular mask of a DM configuration.
+    """
+    height, width = shape
+    cx, cy = width / 2, height / 2
+    radius = (dm.opt_diameter * dm.pixel_scale) / 2  # radius in pixels
+    y, x = np.ogrid[:height, :width]
+    mask = (x - cx) ** 2 + (y - cy) ** 2 >= radius ** 2
+    mask.flags.writeable = False
+    return mask
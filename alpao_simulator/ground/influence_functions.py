@@ -0,0 +1,270 @@
+"""
+Influence Functions Generation
+==============================
+
+Description
+-----------
+This module generates the zonal influence functions of a deformable mirror
+with a Thin Plate Spline (TPS) interpolation of unitary actuator pushes.
+
+Since the actuator coordinates are the same for every push, the TPS system
+is factorized only once and solved for all the actuators as a single
+multi right-hand-side problem. The pixel kernel matrix is then evaluated
+once and shared by all the influence functions, so that the whole cube
+comes out of a few large matrix products.
+
+Only the valid (unmasked) pixels of the mirror are evaluated, in blocks of
+pixels sized to fit a given memory budget, and the influence functions are
+returned packed, in the same pixel order of `mask == 0` indexing.
+The pixel blocks can be distributed over a pool of worker processes, which
+write their results straight into a shared memory output buffer. Blocks are
+also capped at `BLOCK_ROWS` pixels, so that there are enough of them to keep
+many workers busy whatever the memory budget, and each worker runs single
+threaded BLAS, so that the pool does not oversubscribe the cores. The blocks
+do not depend on the number of workers, so the parallel output is
+bit-identical to the serial one.
+
+The kernel follows the one of the `tps` package (``ThinPlateSpline(alpha=0)``),
+which is fitted on integer pixel coordinates: the actuator-to-actuator
+distances are truncated to integers, as `tps` does, so that the generated
+cubes match the ones obtained with one spline per actuator.
+
+Functions
+---------
+    - tps_coefficients(act_pix_coords): Solve the TPS system for all the actuators.
+    - tps_design_matrix(points, act_pix_coords): TPS kernel and affine terms on points.
+    - generate_zonal_iffs(act_pix_coords, mask, mem_budget, workers): Packed zonal influence functions.
+    - pixel_blocks(npix, nActs, mem_budget): Pixel blocks fitting the memory budget.
+    - valid_pixel_coords(mask): Coordinates of the valid pixels of a mask.
+"""
+
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_MEM_BUDGET = 1024  # MB
+BLOCK_ROWS = 4096  # maximum number of pixels per block
+# Identifier of the generation kernel, to be changed whenever the generated
+# influence functions change, so that the cached ones are invalidated
+KERNEL = "tps-r2logr-alpha0-truncated"
+
+# Per-process state of the generation workers
+_worker = {}
+
+
+def tps_coefficients(act_pix_coords, amps=None):
+    """
+    Solves the TPS system for unitary pushes of all the actuators at once.
+
+    Parameters
+    ----------
+    act_pix_coords : np.ndarray
+        Actuator pixel coordinates, of shape (nActs, 2).
+    amps : float or np.ndarray, optional
+        Amplitude(s) of the actuator pushes. Default is 1.0.
+
+    Returns
+    -------
+    np.ndarray
+        TPS parameters, of shape (nActs + 3, nActs): the first nActs rows are
+        the kernel weights, the last 3 the affine coefficients. Column k holds
+        the spline of the k-th actuator push.
+    """
+    act = np.asarray(act_pix_coords)
+    n_acts = act.shape[0]
+    # `tps` casts the control distances to the coordinates dtype (int)
+    dist = np.trunc(_distances(act, act))
+    A = np.zeros((n_acts + 3, n_acts + 3))
+    A[:n_acts, :n_acts] = _rbf(dist)
+    A[:n_acts, n_acts:] = _affine(act)
+    A[n_acts:, :n_acts] = _affine(act).T
+    B = np.zeros((n_acts + 3, n_acts))
+    B[:n_acts] = np.diag(np.ones(n_acts) if amps is None else np.broadcast_to(amps, n_acts))
+    return np.linalg.solve(A, B)
+
+
+def tps_design_matrix(points, act_pix_coords):
+    """
+    Evaluates the TPS kernel and affine terms on the given points.
+
+    Parameters
+    ----------
+    points : np.ndarray
+        Points where to evaluate the spline, of shape (npoints, 2).
+    act_pix_coords : np.ndarray
+        Actuator pixel coordinates, of shape (nActs, 2).
+
+    Returns
+    -------
+    np.ndarray
+        Design matrix, of shape (npoints, nActs + 3).
+    """
+    points = np.asarray(points, dtype=float)
+    act = np.asarray(act_pix_coords)
+    n_acts = act.shape[0]
+    design = np.empty((points.shape[0], n_acts + 3))
+    design[:, :n_acts] = _rbf(_distances(points, act))
+    design[:, n_acts:] = _affine(points)
+    return design
+
+
+def generate_zonal_iffs(
+    act_pix_coords, mask, mem_budget: float = DEFAULT_MEM_BUDGET, workers: int = 1
+):
+    """
+    Generates the zonal influence functions of all the actuators, on the valid
+    pixels of the mask only.
+
+    Parameters
+    ----------
+    act_pix_coords : np.ndarray
+        Actuator pixel coordinates, of shape (nActs, 2).
+    mask : np.ndarray
+        Mirror mask (True where the pixel is masked).
+    mem_budget : float, optional
+        Memory budget, in MB, for the temporary kernel matrices of each
+        process. Pixels are evaluated in blocks fitting in it. Default is 1024 MB.
+    workers : int, optional
+        Number of worker processes among which the pixel blocks are
+        distributed. If 1 (default), the generation runs in the calling
+        process; if 0 or negative, all the available cores are used. The
+        parallel generation requires Python 3.8 or later.
+
+    Returns
+    -------
+    np.ndarray
+        Packed influence functions, of shape (npix, nActs), where npix is
+        the number of valid pixels, ordered as `mask == 0` indexing.
+    """
+    n_acts = np.shape(act_pix_coords)[0]
+    pix_coords = valid_pixel_coords(mask)
+    params = tps_coefficients(act_pix_coords)
+    blocks = pixel_blocks(pix_coords.shape[0], n_acts, mem_budget)
+    if workers < 1:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(blocks))
+    if workers <= 1:
+        packed = np.empty((pix_coords.shape[0], n_acts))
+        for block in blocks:
+            packed[block] = tps_design_matrix(pix_coords[block], act_pix_coords) @ params
+        return packed
+    from multiprocessing import shared_memory  # Python >= 3.8
+
+    shape = (pix_coords.shape[0], n_acts)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, 8 * shape[0] * shape[1]))
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(shm.name, shape, pix_coords, act_pix_coords, params),
+        ) as pool:
+            for _ in pool.map(_evaluate_block, [(b.start, b.stop) for b in blocks]):
+                pass
+        packed = np.ndarray(shape, dtype=float, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return packed
+
+
+def pixel_blocks(npix: int, n_acts: int, mem_budget: float = DEFAULT_MEM_BUDGET):
+    """
+    Splits the pixels in contiguous blocks whose kernel evaluation fits in the
+    memory budget, of at most `BLOCK_ROWS` pixels.
+
+    Parameters
+    ----------
+    npix : int
+        Total number of pixels.
+    n_acts : int
+        Number of actuators.
+    mem_budget : float, optional
+        Memory budget, in MB. Default is 1024 MB.
+
+    Returns
+    -------
+    list of slice
+        Pixel blocks.
+    """
+    # design matrix, distance temporaries and output rows, in float64
+    row_bytes = 8 * (3 * (n_acts + 3) + n_acts)
+    block_size = max(1, min(BLOCK_ROWS, int(mem_budget * 1024**2) // row_bytes))
+    return [slice(i, min(i + block_size, npix)) for i in range(0, npix, block_size)]
+
+
+def valid_pixel_coords(mask):
+    """
+    Returns the (row, column) coordinates of the valid pixels of the mask.
+
+    Parameters
+    ----------
+    mask : np.ndarray
+        Mirror mask (True where the pixel is masked).
+
+    Returns
+    -------
+    np.ndarray
+        Coordinates of the valid pixels, of shape (npix, 2).
+    """
+    return np.column_stack(np.where(np.asarray(mask) == 0)).astype(float)
+
+
+def _init_worker(shm_name, shape, pix_coords, act_pix_coords, params):
+    """
+    Attaches a generation worker to the shared output buffer, with single
+    threaded BLAS (the parallelism is given by the workers).
+    """
+    from multiprocessing import shared_memory
+    from threadpoolctl import threadpool_limits
+
+    _worker["blas"] = threadpool_limits(limits=1, user_api="blas")
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker["shm"] = shm
+    _worker["out"] = np.ndarray(shape, dtype=float, buffer=shm.buf)
+    _worker["pix_coords"] = pix_coords
+    _worker["act_pix_coords"] = act_pix_coords
+    _worker["params"] = params
+
+
+def _evaluate_block(bounds):
+    """
+    Evaluates a block of pixels into the shared output buffer.
+    """
+    block = slice(*bounds)
+    _worker["out"][block] = (
+        tps_design_matrix(_worker["pix_coords"][block], _worker["act_pix_coords"])
+        @ _worker["params"]
+    )
+
+
+def _distances(points, centres):
+    """
+    Euclidean distances between each point and each centre.
+    """
+    points = np.asarray(points, dtype=float)
+    centres = np.asarray(centres, dtype=float)
+    dist = np.subtract.outer(points[:, 0], centres[:, 0])
+    dist *= dist
+    dy = np.subtract.outer(points[:, 1], centres[:, 1])
+    dy *= dy
+    dist += dy
+    return np.sqrt(dist, out=dist)
+
+
+def _rbf(dist):
+    """
+    TPS radial basis function, r^2 log(r), with phi(0) = 0.
+    """
+    dist[dist == 0] = 1
+    phi = np.log(dist)
+    dist *= dist
+    phi *= dist
+    return phi
+
+
+def _affine(points):
+    """
+    Affine terms (1, x, y) of the TPS.
+    """
+    points = np.asarray(points, dtype=float)
+    return np.column_stack((np.ones(points.shape[0]), points))
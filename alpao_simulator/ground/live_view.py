@@ -0,0 +1,99 @@
+"""
+Live View
+=========
+
+Description
+-----------
+This module provides the `BlitRenderer` class, which redraws only the
+changing artists of a matplotlib figure, for the live views of the simulator.
+
+The changing artists are marked as animated, so that a full draw of the
+figure skips them: the figure without them is cached as the background at
+every full draw (the first one, and any resize), and a frame is rendered by
+restoring the background, drawing the animated artists over it and blitting
+the result. The static parts of the figure are never drawn again.
+
+On canvases which do not support blitting, the artists are not animated and
+rendering falls back to an idle full draw of the figure.
+
+Example
+-------
+    >>> renderer = BlitRenderer(fig, [im, text])
+    >>> im.set_data(new_img)
+    >>> renderer.render()
+"""
+
+
+class BlitRenderer:
+    """
+    Blitted rendering of the animated artists of a figure.
+    """
+
+    def __init__(self, fig, artists):
+        """
+        Parameters
+        ----------
+        fig : matplotlib.figure.Figure
+            Figure to render.
+        artists : list
+            Artists changing between frames (images, texts, axes). They are
+            set as animated, if the canvas supports blitting.
+        """
+        self.fig = fig
+        self.artists = list(artists)
+        self._background = None
+        self._set_animated(fig.canvas.supports_blit)
+        self._cid = fig.canvas.mpl_connect("draw_event", self._on_draw)
+
+    def render(self):
+        """
+        Renders a frame, drawing only the animated artists over the cached
+        background.
+        """
+        canvas = self.fig.canvas
+        if not canvas.supports_blit:
+            # animated artists would be skipped by the full draw
+            self._set_animated(False)
+            canvas.draw_idle()
+        elif self._background is None:
+            # the first full draw caches the background and draws the artists
+            canvas.draw()
+        else:
+            canvas.restore_region(self._background)
+            self._draw_artists()
+            canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+
+    def disconnect(self):
+        """
+        Stops caching the background of the figure.
+        """
+        self.fig.canvas.mpl_disconnect(self._cid)
+
+    def _on_draw(self, event):
+        """
+        Caches the background after a full draw of the figure, and draws the
+        animated artists over it.
+        """
+        canvas = self.fig.canvas
+        if event is not None and event.canvas is not canvas:
+            return
+        if not canvas.supports_blit:
+            return
+        self._background = canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_artists()
+
+    def _set_animated(self, animated: bool):
+        """
+        Sets the artists as animated (drawn only by the renderer) or not
+        (drawn by the full draws of the figure).
+        """
+        for artist in self.artists:
+            artist.set_animated(animated)
+
+    def _draw_artists(self):
+        """
+        Draws the animated artists, in z-order.
+        """
+        for artist in sorted(self.artists, key=lambda a: a.get_zorder()):
+            self.fig.draw_artist(artist)
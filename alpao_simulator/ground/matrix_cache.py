@@ -0,0 +1,150 @@
+"""
+Matrix Cache
+============
+
+Description
+-----------
+This module provides the `MatrixCache` class, a folder of raw matrices stored
+in the NumPy `.npy` format, whose data is aligned and can be memory-mapped.
+
+Matrices are opened read-only and zero-copy: nothing is decoded at load time,
+the pages are read from disk only when the data is accessed, and several
+simulator processes on the same host share a single page-cache copy of them.
+
+Matrices can be content-addressed by naming them with `content_key`, a hash
+of the geometry and of the parameters they are derived from: a change in any
+of them gives a new name, so stale matrices are never loaded and the variants
+for different configurations coexist in the same folder.
+
+Example
+-------
+    >>> cache = MatrixCache(fp.MATRIX_CACHE_FOLDER)
+    >>> name = 'dm88_intmat_' + content_key('iff', act_coords, mask)
+    >>> if not cache.exists(name):
+    ...     cache.save(name, IM)
+    >>> IM = cache.load(name)  # read-only np.memmap
+"""
+
+import os
+import hashlib
+import numpy as np
+
+
+def content_key(*parts, length: int = 16):
+    """
+    Hashes the given parts into a short hexadecimal key.
+
+    Parameters
+    ----------
+    *parts : np.ndarray, str, int, float, tuple
+        Arrays and parameters identifying a cached matrix. Arrays are hashed
+        on their dtype, shape and data, anything else on its `repr`.
+    length : int, optional
+        Length of the key. Default is 16.
+
+    Returns
+    -------
+    str
+        Hexadecimal key.
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            h.update(repr((part.dtype.str, part.shape)).encode())
+            h.update(np.ascontiguousarray(part).tobytes())
+        else:
+            h.update(repr(part).encode())
+        h.update(b"\0")
+    return h.hexdigest()[:length]
+
+
+class MatrixCache:
+    """
+    Folder of memory-mappable matrices.
+    """
+
+    def __init__(self, folder: str):
+        """
+        Parameters
+        ----------
+        folder : str
+            Folder of the cached matrices. Created at the first save.
+        """
+        self.folder = folder
+
+    def path(self, name: str):
+        """
+        Returns the file path of a cached matrix.
+
+        Parameters
+        ----------
+        name : str
+            Name of the matrix.
+
+        Returns
+        -------
+        str
+            Path of the `.npy` file of the matrix.
+        """
+        return os.path.join(self.folder, f"{name}.npy")
+
+    def exists(self, name: str):
+        """
+        Checks whether a matrix is in the cache.
+
+        Parameters
+        ----------
+        name : str
+            Name of the matrix.
+
+        Returns
+        -------
+        bool
+            True if the matrix is cached.
+        """
+        return os.path.exists(self.path(name))
+
+    def load(self, name: str):
+        """
+        Opens a cached matrix, read-only and zero-copy.
+
+        Parameters
+        ----------
+        name : str
+            Name of the matrix.
+
+        Returns
+        -------
+        np.memmap
+            Memory-mapped matrix.
+        """
+        return np.load(self.path(name), mmap_mode="r")
+
+    def save(self, name: str, matrix):
+        """
+        Stores a matrix in the cache and returns its memory-mapped copy, so
+        that the in-memory one can be released.
+
+        The file is written under a temporary name and then renamed, so that
+        other processes never open a partially written matrix.
+
+        Parameters
+        ----------
+        name : str
+            Name of the matrix.
+        matrix : np.ndarray
+            Matrix to be stored.
+
+        Returns
+        -------
+        np.memmap
+            Memory-mapped matrix.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        path = self.path(name)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        matrix = np.asarray(matrix)
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(matrix, dtype=matrix.dtype.newbyteorder("=")))
+        os.replace(tmp, path)
+        return self.load(name)
@@ -1,8 +1,8 @@
 import time
-from numpy import uint8
-from astropy.io import fits
+from numpy import uint8, int32
 from numpy.ma import masked_array
 from configparser import ConfigParser
+from alpao_simulator.ground.packed_cube import PackedCube
 
 def load_fits(filepath):
     """
@@ -18,6 +18,8 @@ def load_fits(filepath):
     np.array
         FITS file data.
     """
+    from astropy.io import fits
+
     with fits.open(filepath) as hdul:
         fit = hdul[0].data
         if len(hdul) > 1 and hasattr(hdul[1], 'data'):
@@ -37,12 +39,61 @@ def save_fits(filepath, data):
     data : np.array
         Data to be saved.
     """
+    from astropy.io import fits
+
     if isinstance(data, masked_array):
         fits.writeto(filepath, data.data, overwrite=True)
         if hasattr(data, 'mask'):
             fits.append(filepath, data.mask.astype(uint8))
     else:
         fits.writeto(filepath, data, overwrite=True)
+
+def load_packed_fits(filepath):
+    """
+    Loads a packed cube FITS file, saved with `save_packed_fits`.
+    
+    Parameters
+    ----------
+    filepath : str
+        Path to the FITS file.
+    
+    Returns
+    -------
+    PackedCube
+        Lazy cube view of the packed frames.
+    """
+    from astropy.io import fits
+
+    with fits.open(filepath) as hdul:
+        data = hdul[0].data
+        data = data.astype(data.dtype.newbyteorder('='))
+        mask = hdul[1].data.astype(bool)
+        index = hdul[2].data.astype(int)
+    return PackedCube(data, mask, index)
+
+def save_packed_fits(filepath, cube):
+    """
+    Saves a packed cube in a compact FITS file, storing only the packed
+    (npix, nframes) matrix, the 2D mask and the valid pixels flat index.
+    
+    Parameters
+    ----------
+    filepath : str
+        Path to the FITS file.
+    
+    cube : PackedCube
+        Packed cube to be saved.
+    """
+    from astropy.io import fits
+
+    header = fits.Header()
+    header['PACKED'] = (True, 'packed (npix, nframes) cube')
+    hdul = fits.HDUList([
+        fits.PrimaryHDU(cube.data, header=header),
+        fits.ImageHDU(cube.mask.astype(uint8), name='MASK'),
+        fits.ImageHDU(cube.index.astype(int32), name='INDEX'),
+    ])
+    hdul.writeto(filepath, overwrite=True)
         
 def newtn():
     """
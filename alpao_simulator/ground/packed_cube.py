@@ -0,0 +1,121 @@
+"""
+Packed Cube
+===========
+
+Description
+-----------
+This module provides the `PackedCube` class, a lazy view of a cube of masked
+images which all share the same mask. Only the valid pixels of the frames are
+stored, packed in a (npix, nframes) matrix, together with the 2D mask and the
+flat index of the valid pixels. The dense (height, width, nframes) masked
+cube is built only for the frames which are actually accessed.
+
+Example
+-------
+    >>> cube = PackedCube(packed, mask)
+    >>> cube.shape
+    (512, 512, 88)
+    >>> img = cube[:, :, 10]  # masked 2D image of the 11th frame
+"""
+
+import numpy as np
+
+
+class PackedCube:
+    """
+    Lazy (height, width, nframes) masked cube of packed frames sharing a mask.
+    """
+
+    def __init__(self, data, mask, index=None):
+        """
+        Parameters
+        ----------
+        data : np.ndarray
+            Packed frames, of shape (npix, nframes), with the valid pixels
+            ordered as `mask == 0` indexing.
+        mask : np.ndarray
+            2D mask of the frames (True where the pixel is masked).
+        index : np.ndarray, optional
+            Flat index of the valid pixels. Computed from the mask if not given.
+        """
+        self.mask = np.asarray(mask).astype(bool)
+        self.index = np.flatnonzero(~self.mask) if index is None else np.asarray(index)
+        self.data = data
+        if self.data.shape[0] != self.index.size:
+            raise ValueError(
+                f"Packed data has {self.data.shape[0]} pixels, "
+                f"but the mask has {self.index.size} valid pixels"
+            )
+
+    @property
+    def shape(self):
+        """Shape of the dense cube."""
+        return self.mask.shape + (self.data.shape[1],)
+
+    @property
+    def ndim(self):
+        """Number of dimensions of the dense cube."""
+        return 3
+
+    @property
+    def dtype(self):
+        """Data type of the frames."""
+        return self.data.dtype
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        cube = self.toarray()
+        return cube if dtype is None else cube.astype(dtype)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if any(k is Ellipsis for k in key):
+            e = key.index(Ellipsis)
+            key = key[:e] + (slice(None),) * (4 - len(key)) + key[e + 1 :]
+        key = key + (slice(None),) * (3 - len(key))
+        frames = np.arange(self.shape[2])[key[2]]
+        cube = self._dense(np.atleast_1d(frames))
+        if np.ndim(frames) == 0:
+            cube = cube[:, :, 0]
+        return cube[key[:2]]
+
+    def frame(self, i: int):
+        """
+        Returns a single frame of the cube.
+
+        Parameters
+        ----------
+        i : int
+            Index of the frame.
+
+        Returns
+        -------
+        np.ma.MaskedArray
+            Masked 2D image of the frame.
+        """
+        return self[:, :, i]
+
+    def toarray(self):
+        """
+        Builds the full dense cube.
+
+        Returns
+        -------
+        np.ma.MaskedArray
+            Masked cube, of shape (height, width, nframes).
+        """
+        return self._dense(np.arange(self.shape[2]))
+
+    def _dense(self, frames):
+        """
+        Builds the dense masked cube of the given frames.
+        """
+        height, width = self.mask.shape
+        cube = np.zeros((height * width, frames.size), dtype=self.data.dtype)
+        cube[self.index] = self.data[:, frames]
+        cube = cube.reshape((height, width, frames.size))
+        cube_mask = np.broadcast_to(self.mask[:, :, None], cube.shape)
+        return np.ma.masked_array(cube, mask=cube_mask.copy())
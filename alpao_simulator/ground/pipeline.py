@@ -0,0 +1,172 @@
+"""
+Pipeline
+========
+
+Description
+-----------
+This module provides the building blocks to run the stages of an acquisition
+(computation, acquisition, disk writes) concurrently, so that the throughput
+is limited by the slowest stage instead of the sum of all of them:
+
+    - `background(iterable, maxsize)`: runs a producer in a background thread,
+      prefetching up to `maxsize` items in a bounded queue.
+    - `WriterPool`: a bounded pool of background writer threads, which keeps
+      the order of the submitted jobs, reports the progress in order and
+      propagates the errors of the writers.
+
+Example
+-------
+    >>> with WriterPool(workers=2, progress=lambda done, total: ..., total=n) as pool:
+    ...     for i, img in background(produce_images()):
+    ...         pool.submit(osu.save_fits, f"image_{i:05d}.fits", img)
+"""
+
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+_END = object()
+
+
+class _Raised:
+    """
+    Exception raised by the producer, to be re-raised by the consumer.
+    """
+
+    def __init__(self, error):
+        self.error = error
+
+
+def background(iterable, maxsize: int = 2):
+    """
+    Iterates over an iterable whose items are produced in a background thread.
+
+    Parameters
+    ----------
+    iterable : iterable
+        Producer of the items.
+    maxsize : int, optional
+        Maximum number of items produced in advance. Default is 2.
+
+    Yields
+    ------
+    item
+        The items of the iterable, in order. Errors of the producer are
+        raised in the consumer thread.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def _put(item):
+        """Queues an item, unless the consumer stops; returns False if so."""
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce():
+        try:
+            for item in iterable:
+                if not _put(item):
+                    return
+            _put(_END)
+        except BaseException as e:
+            _put(_Raised(e))
+
+    producer = threading.Thread(target=_produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _END:
+                break
+            if isinstance(item, _Raised):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+class WriterPool:
+    """
+    Bounded pool of background writer threads.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 8, progress=None, total=None):
+        """
+        Parameters
+        ----------
+        workers : int, optional
+            Number of writer threads. Default is 2.
+        max_pending : int, optional
+            Maximum number of jobs submitted and not yet completed: `submit`
+            blocks until the oldest one completes. Default is 8.
+        progress : callable, optional
+            Called as `progress(done, total)` every time a job completes, in
+            the order the jobs were submitted.
+        total : int, optional
+            Total number of jobs, passed to `progress`.
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        self._pending = deque()
+        self._maxPending = max(1, max_pending)
+        self._progress = progress
+        self._total = total
+        self._done = 0
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Submits a write job, blocking while the pool is full.
+
+        Raises the error of any completed job.
+
+        Parameters
+        ----------
+        func : callable
+            Writing function.
+        *args, **kwargs
+            Arguments of the writing function.
+        """
+        while self._pending and self._pending[0].done():
+            self._collect_oldest()
+        while len(self._pending) >= self._maxPending:
+            self._collect_oldest()
+        self._pending.append(self._executor.submit(func, *args, **kwargs))
+
+    def close(self):
+        """
+        Waits for all the submitted jobs, raising the first error among them.
+        """
+        try:
+            while self._pending:
+                self._collect_oldest()
+        finally:
+            for future in self._pending:
+                future.cancel()
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for future in self._pending:
+                future.cancel()
+            self._executor.shutdown(wait=True)
+        return False
+
+    def _collect_oldest(self):
+        """
+        Waits for the oldest job, raising its error, and reports the progress.
+        """
+        self._pending.popleft().result()
+        self._done += 1
+        if self._progress is not None:
+            self._progress(self._done, self._total)
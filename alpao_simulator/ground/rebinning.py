@@ -0,0 +1,197 @@
+"""
+Rebinning
+=========
+
+Description
+-----------
+This module provides the `BinMap` class, which rebins masked images and
+packed pupil data by an integer factor, taking the mask into account.
+
+A bin map is precomputed once per (mask, factor): the valid pixels of the
+mask are sorted by the output bin they fall in, so that rebinning becomes a
+single segmented sum of the packed data (`np.add.reduceat`), divided by the
+number of valid pixels of each bin. Every output bin is the mean of the
+valid pixels it contains, and it is masked only if it contains none of them.
+
+Bin maps are cached by `bin_map`, which keeps the `BIN_MAP_CACHE_SIZE` most
+recently used ones.
+
+Example
+-------
+    >>> bmap = bin_map(dm.mask, 4)
+    >>> small = bmap.rebin_image(img)                  # masked (128, 128) image
+    >>> packed = bmap.rebin(img.data[~dm.mask])        # valid bins only
+    >>> small = bmap.unpack(packed)                    # same as rebin_image
+    >>> packed = bmap.rebin_valid(img)                 # same as bmap.rebin(img.data[~dm.mask])
+"""
+
+import threading
+import numpy as np
+from collections import OrderedDict
+from alpao_simulator.ground.matrix_cache import content_key
+
+BIN_MAP_CACHE_SIZE = 16
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+class BinMap:
+    """
+    Precomputed mask-aware rebinning of a mask by an integer factor.
+    """
+
+    def __init__(self, mask, rebin: int):
+        """
+        Parameters
+        ----------
+        mask : np.ndarray
+            2D mask (True where the pixel is masked).
+        rebin : int
+            Rebinning factor. It must divide both dimensions of the mask.
+        """
+        mask = np.asarray(mask, dtype=bool)
+        height, width = mask.shape
+        rebin = int(rebin)
+        if rebin < 1 or height % rebin or width % rebin:
+            raise ValueError("Cannot downsample by non-integer factors")
+        self.factor = rebin
+        self.shape = (height // rebin, width // rebin)
+        rows, cols = np.nonzero(~mask)
+        bins = (rows // rebin) * self.shape[1] + cols // rebin
+        self.order = np.argsort(bins, kind="stable")
+        self.pixelIndex = np.flatnonzero(~mask)[self.order]
+        self.index, self.starts, counts = np.unique(
+            bins[self.order], return_index=True, return_counts=True
+        )
+        self.counts = counts.astype(float)
+        self.mask = np.ones(self.shape, dtype=bool)
+        self.mask.flat[self.index] = False
+        for array in (self.order, self.pixelIndex, self.index, self.starts, self.counts, self.mask):
+            array.flags.writeable = False
+
+    @property
+    def nbins(self):
+        """Number of valid output bins."""
+        return self.index.size
+
+    def rebin(self, data):
+        """
+        Rebins packed data.
+
+        Parameters
+        ----------
+        data : np.ndarray
+            Packed data, on the valid pixels of the mask in `mask == 0`
+            order, of shape (npix,) or (npix, K).
+
+        Returns
+        -------
+        np.ndarray
+            Rebinned packed data, on the valid output bins in `mask == 0`
+            order of the rebinned mask, of shape (nbins,) or (nbins, K).
+        """
+        data = np.asarray(data)
+        return self._mean(data[self.order])
+
+    def rebin_image(self, img):
+        """
+        Rebins a masked image, whose mask is the one of the bin map.
+
+        Parameters
+        ----------
+        img : np.ma.MaskedArray or np.ndarray
+            Image, of the shape of the mask.
+
+        Returns
+        -------
+        np.ma.MaskedArray
+            Rebinned masked image.
+        """
+        return self.unpack(self.rebin_valid(img))
+
+    def rebin_valid(self, img):
+        """
+        Rebins the valid pixels of an image, whose mask is the one of the bin
+        map, into packed data.
+
+        Parameters
+        ----------
+        img : np.ma.MaskedArray or np.ndarray
+            Image, of the shape of the mask.
+
+        Returns
+        -------
+        np.ndarray
+            Rebinned packed data, on the valid output bins in `mask == 0`
+            order of the rebinned mask.
+        """
+        data = np.ma.getdata(img).reshape(-1)
+        return self._mean(data[self.pixelIndex])
+
+    def unpack(self, packed, out=None):
+        """
+        Builds the rebinned masked image of rebinned packed data.
+
+        Parameters
+        ----------
+        packed : np.ndarray
+            Rebinned packed data, of shape (nbins,).
+        out : np.ndarray, optional
+            Buffer for the image data, of the rebinned shape.
+
+        Returns
+        -------
+        np.ma.MaskedArray
+            Rebinned masked image.
+        """
+        if out is None:
+            image = np.zeros(self.shape, dtype=packed.dtype)
+        elif out.shape != self.shape:
+            raise ValueError(f"Output buffer must have shape {self.shape}")
+        else:
+            image = out
+            image[...] = 0
+        image.flat[self.index] = packed
+        return np.ma.masked_array(image, mask=self.mask.copy())
+
+    def _mean(self, sorted_data):
+        """
+        Means of the data, sorted by bin, over the valid pixels of each bin.
+        """
+        dtype = np.result_type(sorted_data.dtype, np.float32)
+        if self.nbins == 0:
+            return np.zeros((0,) + sorted_data.shape[1:], dtype=dtype)
+        sums = np.add.reduceat(sorted_data.astype(dtype, copy=False), self.starts, axis=0)
+        counts = self.counts.astype(dtype)
+        return sums / (counts if sums.ndim == 1 else counts[:, None])
+
+
+def bin_map(mask, rebin: int):
+    """
+    Returns the bin map of a mask for a rebinning factor, from the cache of
+    the most recently used ones.
+
+    Parameters
+    ----------
+    mask : np.ndarray
+        2D mask (True where the pixel is masked).
+    rebin : int
+        Rebinning factor.
+
+    Returns
+    -------
+    BinMap
+        Bin map of the mask.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    key = content_key(mask, int(rebin))
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    bmap = BinMap(mask, rebin)
+    with _lock:
+        _cache[key] = bmap
+        while len(_cache) > BIN_MAP_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return bmap
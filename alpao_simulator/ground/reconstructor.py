@@ -0,0 +1,152 @@
+"""
+Reconstructor
+=============
+
+Description
+-----------
+This module provides the `Reconstructor` class, which computes once the thin
+singular value decomposition of an interaction matrix and derives from its
+cached factors the (truncated or regularized) reconstruction matrices.
+
+For an interaction matrix IM (nActs, npix) = U S V^T, only U (nActs, nActs)
+and the singular values S are kept. Every reconstructor is then a filter
+F = U f(S) U^T in the (small) actuators space, applied after a projection
+on the influence functions:
+
+    RM = IM^T F          (npix, nActs)
+    cmd = (img @ IM^T) @ F
+
+with f(s) = 1/s^2 for the pseudo-inverse, zeroed on the truncated modes, or
+f(s) = 1/(s^2 + tikhonov) for the Tikhonov regularized inverse. Changing the
+truncation or the regularization only recomputes the nActs x nActs filter,
+so `filter` and `reconstruct` take milliseconds; `matrix` still costs the
+npix x nActs x nActs product forming RM.
+
+The decomposition can be computed with a thin SVD of IM (method 'svd', the
+default, accurate as `np.linalg.pinv`) or through the nActs x nActs normal
+equations (method 'gram', faster, but accurate only down to singular values
+of about the square root of the machine precision, hence its larger default
+cutoff).
+
+Example
+-------
+    >>> rec = Reconstructor(dm.IM)
+    >>> RM = rec.matrix()                  # np.linalg.pinv(dm.IM), to rounding
+    >>> RM_reg = rec.matrix(tikhonov=1e-3)
+    >>> cmd = rec.reconstruct(img.compressed(), n_modes=200)
+"""
+
+import numpy as np
+
+
+class Reconstructor:
+    """
+    Reconstruction matrices from the cached thin SVD of an interaction matrix.
+    """
+
+    def __init__(self, IM, method: str = "svd", U=None, s=None):
+        """
+        Parameters
+        ----------
+        IM : np.ndarray
+            Interaction matrix, of shape (nActs, npix).
+        method : str, optional
+            Method used to compute the decomposition, 'svd' (default), with a
+            thin SVD of IM, or 'gram', through the normal equations.
+        U, s : np.ndarray, optional
+            Already computed left singular vectors and singular values of IM,
+            sorted in decreasing order. If not given, they are computed.
+        """
+        if method not in ("gram", "svd"):
+            raise ValueError(f"Unknown decomposition method '{method}'")
+        self.IM = IM
+        self.method = method
+        if U is None or s is None:
+            U, s = self._decompose()
+        self.U = U
+        self.s = s
+
+    @property
+    def nModes(self):
+        """Number of singular modes of the interaction matrix."""
+        return self.s.size
+
+    def filter(self, n_modes: int = None, tikhonov: float = 0.0, rcond: float = None):
+        """
+        Computes the reconstruction filter in the actuators space.
+
+        Parameters
+        ----------
+        n_modes : int, optional
+            Number of singular modes to keep. Default is all of them.
+        tikhonov : float, optional
+            Tikhonov regularization parameter. Default is 0 (pseudo-inverse).
+        rcond : float, optional
+            Singular values smaller than rcond times the largest one are
+            discarded. Default is 1e-15 for 'svd' and 1e-7 for 'gram', whose
+            singular values are accurate down to about the square root of
+            the machine precision.
+
+        Returns
+        -------
+        np.ndarray
+            Reconstruction filter F, of shape (nActs, nActs).
+        """
+        if rcond is None:
+            rcond = 1e-15 if self.method == "svd" else 1e-7
+        s2 = self.s**2
+        keep = self.s > rcond * self.s[0]
+        if n_modes is not None:
+            keep[n_modes:] = False
+        f = np.zeros_like(s2)
+        f[keep] = 1 / (s2[keep] + tikhonov)
+        return (self.U * f) @ self.U.T
+
+    def matrix(self, n_modes: int = None, tikhonov: float = 0.0, rcond: float = None):
+        """
+        Computes the reconstruction matrix. Unlike the filter, this costs a
+        (npix, nActs) x (nActs, nActs) product.
+
+        Parameters
+        ----------
+        n_modes, tikhonov, rcond :
+            See `Reconstructor.filter`.
+
+        Returns
+        -------
+        np.ndarray
+            Reconstruction matrix RM, of shape (npix, nActs).
+        """
+        return self.IM.T @ self.filter(n_modes, tikhonov, rcond)
+
+    def reconstruct(
+        self, img, n_modes: int = None, tikhonov: float = 0.0, rcond: float = None
+    ):
+        """
+        Reconstructs the actuators command of packed images, without forming
+        the reconstruction matrix.
+
+        Parameters
+        ----------
+        img : np.ndarray
+            Packed image, of shape (npix,), or images, of shape (K, npix).
+        n_modes, tikhonov, rcond :
+            See `Reconstructor.filter`.
+
+        Returns
+        -------
+        np.ndarray
+            Command(s), of shape (nActs,) or (K, nActs).
+        """
+        return (img @ self.IM.T) @ self.filter(n_modes, tikhonov, rcond)
+
+    def _decompose(self):
+        """
+        Computes the left singular vectors and the singular values of IM.
+        """
+        if self.method == "svd":
+            U, s, _ = np.linalg.svd(self.IM, full_matrices=False)
+            return U, s
+        w, U = np.linalg.eigh(self.IM @ self.IM.T)
+        w, U = w[::-1], U[:, ::-1]
+        return np.ascontiguousarray(U), np.sqrt(np.clip(w, 0, None))
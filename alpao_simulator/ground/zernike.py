@@ -15,13 +15,19 @@ polynomials are commonly used in optics and wavefront analysis.
 
 Functions
 ---------
-    - removeZernike(ima, modes=np.array([1, 2, 3, 4])): Remove Zernike modes from an image.
-    - removeZernikeAuxMask(img, mm, zlist): Remove Zernike modes from an image using an auxiliary mask.
+    - removeZernike(ima, modes=np.array([1, 2, 3, 4]), dtype=None): Remove Zernike modes from an image.
+    - removeZernikeAuxMask(img, mm, zlist, dtype=None): Remove Zernike modes from an image using an auxiliary mask.
     - zernikeFit(img, zernike_index_vector, qpupil=True): Fit Zernike modes to an image.
     - zernikeFitAuxmask(img, auxmask, zernike_index_vector): Fit Zernike modes to an image using an auxiliary mask.
-    - zernikeSurface(img, coef, mat): Generate Zernike surface from coefficients and matrix.
+    - zernikeFitCube(cube, zernike_index_vector, qpupil=True): Fit Zernike modes to a cube of images.
+    - removeZernikeCube(cube, modes, out=None, qpupil=True, dtype=None): Remove Zernike modes from a cube of images.
+    - zernikeSurface(img, coef, mat, dtype=None): Generate Zernike surface from coefficients and matrix.
+    - clear_fit_cache(): Empty the cache of the Zernike fitting bases.
     - _surf_fit(xx, yy, zz, zlist, ordering='noll'): Fit surface using Zernike polynomials.
+    - generate_zernike_matrix(noll_ids, img_mask, scale_length=None): Zernike interaction matrix on a mask.
     - _getZernike(xx, yy, zlist, ordering='noll'): Get Zernike polynomials.
+    - _zernike_matrix(m, n, rho, phi): Evaluate a set of Zernike polynomials in a single pass.
+    - _mn_table(zlist, ordering='noll'): Cached conversion of Zernike indices to (m, n).
     - _zernike_rad(m, n, rho): Calculate the radial component of Zernike polynomial (m, n).
     - _zernike(m, n, rho, phi): Calculate Zernike polynomial (m, n).
     - _zernikel(j, rho, phi): Calculate Zernike polynomial with Null coordinate j.
@@ -57,10 +63,20 @@ Example
 import numpy as np
 import alpao_simulator.ground._geo as geo
 import math
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from alpao_simulator.ground.matrix_cache import content_key
+from alpao_simulator.ground.packed_cube import PackedCube
 
 fac = math.factorial
 
-def removeZernike(ima, modes=np.array([1, 2, 3, 4])):
+FIT_CACHE_SIZE = 16  # number of fitting bases kept in memory
+CUBE_BLOCK = 64  # frames fitted together in the cube routines
+_fit_cache = OrderedDict()
+_fit_lock = threading.Lock()
+
+def removeZernike(ima, modes=np.array([1, 2, 3, 4]), dtype=None):
     """
     Remove Zernike modes from an image.
 
@@ -70,6 +86,9 @@ def removeZernike(ima, modes=np.array([1, 2, 3, 4])):
         Image from which Zernike modes are to be removed.
     modes : numpy array, optional
         Zernike modes to be removed. Default is np.array([1, 2, 3, 4]).
+    dtype : data-type, optional
+        Precision of the result: float64 (default), or float32 for the
+        float32 precision mode of the DMs.
 
     Returns
     -------
@@ -77,10 +96,9 @@ def removeZernike(ima, modes=np.array([1, 2, 3, 4])):
         Image with Zernike modes removed.
     """
     coeff, mat = zernikeFit(ima, modes)
-    surf = zernikeSurface(ima, coeff, mat)
-    return ima - surf
+    return _subtract_surface(ima, np.dot(mat, coeff), dtype)
 
-def removeZernikeAuxMask(img, mm, zlist):
+def removeZernikeAuxMask(img, mm, zlist, dtype=None):
     """
     Remove Zernike modes from an image using an auxiliary mask.
 
@@ -92,6 +110,8 @@ def removeZernikeAuxMask(img, mm, zlist):
         Auxiliary mask.
     zlist : numpy array
         List of Zernike modes to be removed.
+    dtype : data-type, optional
+        Precision of the result (see `removeZernike`).
 
     Returns
     -------
@@ -99,13 +119,16 @@ def removeZernikeAuxMask(img, mm, zlist):
         Image with Zernike modes removed.
     """
     coef, mat = zernikeFitAuxmask(img, mm, zlist)
-    surf = zernikeSurface(img, coef, mat)
-    return np.ma.masked_array(img - surf, img.mask)
+    return _subtract_surface(img, np.dot(mat, coef), dtype)
 
 def zernikeFit(img, zernike_index_vector, qpupil: bool = True):
     """
     Fit Zernike modes to an image.
 
+    The Zernike basis and its projector are cached for the mask of the
+    image (see `_fitting_basis`), so that repeated fits on the same mask
+    cost a single matrix-vector product.
+
     Parameters
     ----------
     img : numpy masked array
@@ -118,14 +141,11 @@ def zernikeFit(img, zernike_index_vector, qpupil: bool = True):
     coeff : numpy array
         Vector of Zernike coefficients.
     mat : numpy array
-        Matrix of Zernike polynomials.
+        Matrix of Zernike polynomials (read-only).
     """
-    img1 = img.data
-    mask = np.invert(img.mask).astype(int)
-    xx, yy = geo.qpupil(mask) if qpupil else geo.qpupil_circle(img)
-    mm = mask == 1
-    coeff = _surf_fit(xx[mm], yy[mm], img1[mm], zernike_index_vector)
-    mat = _getZernike(xx[mm], yy[mm], zernike_index_vector)
+    mask = np.ma.getmaskarray(img)
+    mat, proj = _fitting_basis(mask, zernike_index_vector, qpupil=qpupil)
+    coeff = np.dot(proj, img.data[~mask])
     return coeff, mat
 
 def zernikeFitAuxmask(img, auxmask, zernike_index_vector):
@@ -146,17 +166,107 @@ def zernikeFitAuxmask(img, auxmask, zernike_index_vector):
     coeff : numpy array
         Vector of Zernike coefficients.
     mat : numpy array
-        Matrix of Zernike polynomials.
+        Matrix of Zernike polynomials (read-only).
     """
-    img1 = img.data
-    mask = np.invert(img.mask).astype(int)
-    xx, yy = geo.qpupil(auxmask)
-    mm = mask == 1
-    coeff = _surf_fit(xx[mm], yy[mm], img1[mm], zernike_index_vector)
-    mat = _getZernike(xx[mm], yy[mm], zernike_index_vector)
+    mask = np.ma.getmaskarray(img)
+    mat, proj = _fitting_basis(mask, zernike_index_vector, auxmask=auxmask)
+    coeff = np.dot(proj, img.data[~mask])
     return coeff, mat
 
-def zernikeSurface(img, coef, mat):
+def zernikeFitCube(cube, zernike_index_vector, qpupil: bool = True):
+    """
+    Fit Zernike modes to a cube of images.
+
+    The frames sharing the same mask are fitted together, with a single
+    multi right-hand side projection per block of frames. Frames with
+    different masks are grouped automatically.
+
+    Parameters
+    ----------
+    cube : numpy masked array or PackedCube
+        Cube of images, of shape (height, width, nframes).
+    zernike_index_vector : numpy array
+        Vector containing the index of Zernike modes to be fitted starting from 1.
+    qpupil : bool, optional
+        See `zernikeFit`. Default is True.
+
+    Returns
+    -------
+    coeff : numpy array
+        Zernike coefficients, one column per frame, of shape (nmodes, nframes).
+    """
+    coeff = np.empty((np.size(zernike_index_vector), cube.shape[2]))
+    for mask, frames in _mask_groups(cube):
+        _, proj = _fitting_basis(mask, zernike_index_vector, qpupil=qpupil)
+        index = np.flatnonzero(~mask)
+        for block in _frame_blocks(frames):
+            coeff[:, block] = np.dot(proj, _packed_frames(cube, index, block))
+    return coeff
+
+def removeZernikeCube(
+    cube, modes=np.array([1, 2, 3, 4]), out=None, qpupil: bool = True, dtype=None
+):
+    """
+    Remove Zernike modes from a cube of images.
+
+    Same as calling `removeZernike` on every frame, with the fit of
+    `zernikeFitCube`, writing the residual frames in a single buffer.
+
+    Parameters
+    ----------
+    cube : numpy masked array or PackedCube
+        Cube of images, of shape (height, width, nframes).
+    modes : numpy array, optional
+        Zernike modes to be removed. Default is np.array([1, 2, 3, 4]).
+    out : numpy array, optional
+        Writable buffer for the residual frames, of any memory layout: of
+        shape (height, width, nframes) for a masked array cube, or (npix,
+        nframes) for a PackedCube. It can be the data of the cube itself, to
+        remove the modes in place; for memory-mapped cubes, such as the ones
+        of `frame_store.load_frames`, this requires opening them with
+        `mmap_mode='r+'`.
+    qpupil : bool, optional
+        See `zernikeFit`. Default is True.
+    dtype : data-type, optional
+        Precision of the result, if `out` is not given (see `removeZernike`).
+
+    Returns
+    -------
+    new_cube : numpy masked array or PackedCube
+        Cube with Zernike modes removed, whose data is `out`.
+    """
+    packed = isinstance(cube, PackedCube)
+    shape = cube.data.shape if packed else cube.shape
+    if out is None:
+        out = np.empty(shape, dtype=_result_dtype(dtype))
+    elif out.shape != shape:
+        raise ValueError(f"Output buffer must have shape {shape}")
+    elif not out.flags.writeable:
+        raise ValueError(
+            "Output buffer must be writable (memory-mapped cubes must be opened "
+            "with mmap_mode='r+')"
+        )
+    if not packed:
+        data = np.ma.getdata(cube)
+        if not _same_buffer(out, data):
+            out[...] = data
+    for mask, frames in _mask_groups(cube):
+        mat, proj = _fitting_basis(mask, modes, qpupil=qpupil)
+        index = np.flatnonzero(~mask)
+        # valid pixels of the output, whatever its memory layout
+        if packed:
+            pixels = (slice(None),)
+        else:
+            pixels = tuple(i[:, None] for i in np.unravel_index(index, shape[:2]))
+        for block in _frame_blocks(frames):
+            data = _packed_frames(cube, index, block, out.dtype)
+            data -= np.dot(mat, np.dot(proj, data))
+            out[pixels + (block,)] = data
+    if packed:
+        return PackedCube(out, cube.mask, cube.index)
+    return np.ma.masked_array(out, mask=np.ma.getmaskarray(cube).copy())
+
+def zernikeSurface(img, coef, mat, dtype=None):
     """
     Generate Zernike surface from coefficients and matrix.
 
@@ -168,6 +278,8 @@ def zernikeSurface(img, coef, mat):
         Vector of Zernike coefficients.
     mat : numpy array
         Matrix of Zernike polynomials.
+    dtype : data-type, optional
+        Precision of the result (see `removeZernike`).
 
     Returns
     -------
@@ -175,16 +287,157 @@ def zernikeSurface(img, coef, mat):
         Zernike surface generated by coefficients.
     """
     mm = np.where(img.mask == 0)
-    zernike_surface = np.zeros(img.shape)
+    zernike_surface = np.zeros(img.shape, dtype=_result_dtype(dtype))
     zernike_surface[mm] = np.dot(mat, coef)
     return np.ma.masked_array(zernike_surface, mask=img.mask)
 
 
+def clear_fit_cache():
+    """
+    Empties the cache of the Zernike fitting bases.
+    """
+    with _fit_lock:
+        _fit_cache.clear()
+
+
+def _fitting_basis(mask, zlist, ordering="noll", qpupil: bool = True, auxmask=None):
+    """
+    Returns the Zernike basis on the valid pixels of a mask, and its
+    pseudo-inverse projector, so that the fitting coefficients of an image
+    are `proj @ img.data[~mask]`.
+
+    The pairs are cached on (mask fingerprint, modes, ordering, pupil
+    coordinates), keeping the FIT_CACHE_SIZE most recently used ones.
+
+    Parameters
+    ----------
+    mask : matrix bool
+        Mask of the image, True on the invalid pixels.
+    zlist : numpy array
+        List of Zernike modes.
+    ordering : str, optional
+        Ordering of Zernike modes. Default is 'noll'.
+    qpupil : bool, optional
+        If True (default), the pupil coordinates are computed on the
+        bounding box of the mask, otherwise on the circle fitted to its
+        borders.
+    auxmask : numpy array, optional
+        Auxiliary mask on which the pupil coordinates are computed.
+
+    Returns
+    -------
+    mat : numpy array
+        Zernike polynomials on the valid pixels, of shape (npix, nmodes).
+    proj : numpy array
+        Projector, of shape (nmodes, npix).
+    """
+    zlist = tuple(np.asarray(zlist, dtype=int).ravel().tolist())
+    key = content_key(mask, zlist, ordering, bool(qpupil), auxmask)
+    with _fit_lock:
+        if key in _fit_cache:
+            _fit_cache.move_to_end(key)
+            return _fit_cache[key]
+    if auxmask is not None:
+        xx, yy = geo.qpupil(auxmask)
+    elif qpupil:
+        xx, yy = geo.qpupil(np.invert(mask).astype(int))
+    else:
+        xx, yy = geo.qpupil_circle(np.ma.masked_array(np.zeros(mask.shape), mask))
+    mm = ~mask
+    mat = _getZernike(xx[mm], yy[mm], zlist, ordering)
+    proj = np.linalg.pinv(mat)
+    mat.flags.writeable = False
+    proj.flags.writeable = False
+    with _fit_lock:
+        _fit_cache[key] = (mat, proj)
+        _fit_cache.move_to_end(key)
+        while len(_fit_cache) > FIT_CACHE_SIZE:
+            _fit_cache.popitem(last=False)
+    return mat, proj
+
+
+def _mask_groups(cube):
+    """
+    Groups the frames of a cube by mask.
+
+    Parameters
+    ----------
+    cube : numpy masked array or PackedCube
+        Cube of images, of shape (height, width, nframes).
+
+    Returns
+    -------
+    list of (mask, frames)
+        The distinct masks of the cube, with the indices of their frames.
+    """
+    if isinstance(cube, PackedCube):
+        return [(cube.mask, np.arange(cube.shape[2]))]
+    masks = np.ma.getmaskarray(cube)
+    bits = np.ascontiguousarray(np.packbits(masks.reshape(-1, masks.shape[2]), axis=0).T)
+    groups = {}
+    for i, key in enumerate(bits):
+        groups.setdefault(key.tobytes(), []).append(i)
+    return [(masks[:, :, f[0]].copy(), np.array(f)) for f in groups.values()]
+
+
+def _frame_blocks(frames):
+    """
+    Splits an array of frame indices into blocks of CUBE_BLOCK frames.
+    """
+    return [frames[i : i + CUBE_BLOCK] for i in range(0, len(frames), CUBE_BLOCK)]
+
+
+def _packed_frames(cube, index, frames, dtype=np.float64):
+    """
+    Valid pixels, with flat index `index`, of some frames of a cube, as a new
+    array of shape (npix, len(frames)).
+    """
+    if isinstance(cube, PackedCube):
+        return np.array(cube.data[:, frames], dtype=dtype)
+    flat = np.ma.getdata(cube).reshape(-1, cube.shape[2])
+    return flat[np.ix_(index, frames)].astype(dtype, copy=False)
+
+
+def _same_buffer(a, b):
+    """
+    Whether two arrays are the same view of the same memory.
+    """
+    return (
+        a.__array_interface__["data"][0] == b.__array_interface__["data"][0]
+        and a.strides == b.strides
+        and a.shape == b.shape
+    )
+
+
+def _result_dtype(dtype=None):
+    """
+    Precision of the results: float64, unless float32 is explicitly requested
+    (float32 precision mode of the DMs).
+    """
+    if dtype is not None and np.dtype(dtype) == np.float32:
+        return np.dtype(np.float32)
+    return np.dtype(np.float64)
+
+
+def _subtract_surface(img, surf, dtype=None):
+    """
+    Subtracts a surface, given on the valid pixels, from a masked image.
+    """
+    mask = np.ma.getmaskarray(img)
+    data = np.array(img.data, dtype=_result_dtype(dtype))
+    data[~mask] -= surf
+    return np.ma.masked_array(data, mask=mask.copy())
+
+
 def generate_zernike_matrix(noll_ids, img_mask, scale_length:float = None):
     """
     Generates the interaction matrix of the Zernike modes with Noll index
     in noll_ids on the mask in input
 
+    The polar coordinates are computed once, on the valid pixels only, and
+    all the modes are evaluated in a single pass over the radial orders
+    (see `_zernike_matrix`).
+
     Parameters
     ----------
     noll_ids : ndarray(int) [Nzern,]
@@ -203,60 +456,52 @@ def generate_zernike_matrix(noll_ids, img_mask, scale_length:float = None):
         The Zernike interaction matrix of the given indices on the given mask.
 
     """
-    n_pix = np.sum(1-img_mask)
     if isinstance(noll_ids, int):
         noll_ids = np.arange(1,noll_ids+1, 1)
-    n_zern = len(noll_ids)
-    ZernMat = np.zeros([n_pix,n_zern])
-    for i in range(n_zern):
-        ZernMat[:,i] = _project_zernike_on_mask(noll_ids[i], img_mask, scale_length)
+    noll_ids = np.asarray(noll_ids, dtype=int)
+    if noll_ids.size and noll_ids.min() < 1:
+        raise ValueError("Noll index must be equal to or greater than 1")
+    img_mask = np.asarray(img_mask, dtype=bool)
+    rho, phi = _mask_polar_coordinates(img_mask, scale_length)
+    m, n = _mn_table(tuple(noll_ids.tolist()), "ansi")
+    ZernMat = _zernike_matrix(m, n, rho, phi)
+    # Normalization of the masked data: null mean and unit STD
+    norm = noll_ids > 1
+    if np.any(norm):
+        mean = ZernMat.mean(axis=0)
+        mean[~norm] = 0
+        ZernMat -= mean
+        std = np.sqrt(np.einsum("ij,ij->j", ZernMat, ZernMat) / ZernMat.shape[0])
+        std[~norm] = 1
+        ZernMat /= std
     return ZernMat
 
 
-def _project_zernike_on_mask(noll_number:int, mask, scale_length:float = None):
+def _mask_polar_coordinates(mask, scale_length:float = None):
     """
-    Project the Zernike polynomials identified by the Noll number in input
-    on a given mask.
-    The polynomials are computed on the circle inscribed in the mask by default,
-    or on a circle of radius scale_length if the corresponding input is given
-    Masked data is then normalized as follows:
-    data = ma.data[~ma.mask], data = (data - mean(data))/std(data)
+    Computes the polar coordinates of the valid pixels of a mask, on the
+    circle inscribed in the mask by default, or on a circle of radius
+    scale_length if the corresponding input is given.
 
     Parameters
     ----------
-    noll_number : int
-        Noll index of the desired Zernike polynomial.
     mask : matrix bool
         Mask of the desired image.
+    scale_length : float, optional
+        Radius of the circle on which the polar coordinates are defined.
 
     Returns
     -------
-    masked_data : ndarray
-        Flattenned array of the masked values of the Zernike 
-        shape projected on the mask.
-
+    rho, phi : ndarray
+        Radial and azimuthal coordinates of the valid pixels, in the order
+        of `data[~mask]`.
     """
-    if noll_number < 1:
-        raise ValueError("Noll index must be equal to or greater than 1")
-    # Image dimensions
     X,Y = np.shape(mask)
-    # Determine circle radius on to which define the Zernike
-    if scale_length is not None:
-        r = scale_length
-    else:
-        r = np.max([X,Y])/2
-    # Conversion to polar coordinates on circle of radius r 
-    phi = lambda i,j: np.arctan2((j-Y/2.)/r,(i-X/2.)/r)
-    rho = lambda i,j: np.sqrt(((j-Y/2.)/r)**2+((i-X/2.)/r)**2)
-    mode = np.fromfunction(lambda i,j: _zernikel(noll_number, rho(i,j), phi(i,j)), [X,Y])
-    # masked_mode = np.ma.masked_array(mode,mask)
-    # plt.figure();plt.imshow(masked_mode,origin='lower');plt.title('Zernike ' + str(noll_number))
-    # masked_data = masked_mode.data[~masked_mode.mask]
-    masked_data = mode[~mask]
-    # Normalization of the masked data: null mean and unit STD
-    if noll_number > 1:
-        masked_data = (masked_data - np.mean(masked_data))/np.std(masked_data)
-    return masked_data
+    r = scale_length if scale_length is not None else np.max([X,Y])/2
+    i, j = np.nonzero(~mask)
+    u = (i - X/2.)/r
+    v = (j - Y/2.)/r
+    return np.hypot(u, v), np.arctan2(v, u)
 
 
 def _surf_fit(xx, yy, zz, zlist, ordering="noll"):
@@ -305,16 +550,102 @@ def _getZernike(xx, yy, zlist, ordering="noll"):
         raise ValueError("Zernike index must be greater or equal to 1")
     rho = np.sqrt(yy**2 + xx**2)
     phi = np.arctan2(yy, xx)
-    zkm = []
-    for j in zlist:
-        if ordering == "noll":
-            m, n = _l2mn_noll(j)
-            cnorm = np.sqrt(n + 1) if m == 0 else np.sqrt(2.0 * (n + 1))
-        elif ordering == "ansi":
-            m, n = _l2mn_ansi(j)
-            cnorm = 1
-        zkm.append(cnorm * _zernike(m, n, rho, phi))
-    return np.transpose(np.array(zkm))
+    m, n = _mn_table(tuple(np.asarray(zlist, dtype=int).tolist()), ordering)
+    zkm = _zernike_matrix(m, n, rho, phi)
+    if ordering == "noll":
+        zkm *= np.where(m == 0, np.sqrt(n + 1), np.sqrt(2.0 * (n + 1)))
+    return zkm
+
+def _zernike_matrix(m, n, rho, phi):
+    """
+    Evaluates a set of Zernike polynomials (m, n) on the same coordinates,
+    in a single pass over the radial orders.
+
+    The radial polynomials are built with the recurrence relation
+
+        R_n^m = rho * (R_{n-1}^{|m-1|} + R_{n-1}^{m+1}) - R_{n-2}^m
+
+    starting from R_0^0 = 1 (with R_n^m = 0 for m > n), which reuses the
+    two previous orders and is numerically stable, unlike the explicit
+    factorial sums. The azimuthal terms are computed once per |m|.
+
+    Parameters
+    ----------
+    m, n : numpy arrays
+        Zernike polynomial indices of the modes.
+    rho, phi : numpy arrays
+        Radial and azimuthal coordinates, flattened.
+
+    Returns
+    -------
+    zkm : numpy array
+        Zernike polynomials, of shape (len(rho), len(m)), stored by column.
+    """
+    m = np.asarray(m, dtype=int)
+    n = np.asarray(n, dtype=int)
+    if np.any((n < 0) | (np.abs(m) > n)):
+        raise ValueError("Invalid Zernike polynomial indices")
+    rho = np.ravel(rho)
+    phi = np.ravel(phi)
+    zkm = np.zeros((len(m), len(rho)), dtype=np.result_type(rho, float))
+    if len(m) == 0:
+        return zkm.T
+    trig = {}
+    prev2, prev1 = {}, {}
+    for order in range(n.max() + 1):
+        rad = {}
+        for am in range(order % 2, order + 1, 2):
+            if order == 0:
+                r = np.ones_like(rho, dtype=zkm.dtype)
+            else:
+                r = prev1[abs(am - 1)].copy()
+                if am + 1 in prev1:
+                    r += prev1[am + 1]
+                r *= rho
+                if am in prev2:
+                    r -= prev2[am]
+            rad[am] = r
+        for col in np.flatnonzero(n == order):
+            mm = m[col]
+            if (order - mm) % 2:
+                continue
+            if mm == 0:
+                zkm[col] = rad[0]
+                continue
+            if mm not in trig:
+                trig[mm] = np.cos(mm * phi) if mm > 0 else np.sin(-mm * phi)
+            np.multiply(rad[abs(mm)], trig[mm], out=zkm[col])
+        prev2, prev1 = prev1, rad
+    return zkm.T
+
+@lru_cache(maxsize=32)
+def _mn_table(zlist, ordering="noll"):
+    """
+    Converts a list of Zernike indices into the (m, n) indices of the
+    polynomials. The tables are cached.
+
+    Parameters
+    ----------
+    zlist : tuple
+        Zernike indices.
+    ordering : str, optional
+        Ordering of the Zernike indices, 'noll' (default) or 'ansi'.
+
+    Returns
+    -------
+    m, n : numpy arrays
+        Zernike polynomial indices, read-only.
+    """
+    if ordering == "noll":
+        l2mn = _l2mn_noll
+    elif ordering == "ansi":
+        l2mn = _l2mn_ansi
+    else:
+        raise ValueError(f"Unknown Zernike ordering '{ordering}'")
+    m, n = np.array([l2mn(j) for j in zlist], dtype=int).reshape(-1, 2).T
+    m.flags.writeable = False
+    n.flags.writeable = False
+    return m, n
 
 def _zernike_rad(m, n, rho):
     """
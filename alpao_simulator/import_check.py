@@ -0,0 +1,119 @@
+"""
+Import Check
+============
+
+Description
+-----------
+Import-time benchmark of the simulator, guarding against regressions of its
+import cost and side effects.
+
+The simulator modules are imported in fresh interpreters, and the check fails
+if:
+
+    - the import takes longer than `IMPORT_BUDGET` seconds (best of `REPEAT`
+      runs, numpy included);
+    - any of the heavy optional dependencies in `LAZY_MODULES`, which must be
+      imported only by the features using them, is imported;
+    - any directory is created.
+
+The check runs with the test suite (`tests/test_import.py`), and standalone.
+
+Usage
+-----
+    $ python -m alpao_simulator.import_check
+"""
+
+import sys
+import json
+import subprocess
+
+MODULES = ("alpao_simulator.deformable_mirror", "alpao_simulator.interferometer")
+LAZY_MODULES = ("matplotlib", "tps", "m4", "skimage", "astropy", "threadpoolctl")
+IMPORT_BUDGET = 0.5  # s
+REPEAT = 3
+
+_PROBE = """
+import os, sys, json, time
+made = []
+_makedirs, _mkdir = os.makedirs, os.mkdir
+os.makedirs = lambda path, *a, **k: (made.append(str(path)), _makedirs(path, *a, **k))[1]
+os.mkdir = lambda path, *a, **k: (made.append(str(path)), _mkdir(path, *a, **k))[1]
+t0 = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - t0
+loaded = [m for m in {lazy!r} if m in sys.modules]
+print(json.dumps({{"elapsed": elapsed, "loaded": loaded, "made": made}}))
+"""
+
+
+def check_import(modules=MODULES, repeat: int = REPEAT, cwd: str = None):
+    """
+    Measures the import of the simulator modules in fresh interpreters.
+
+    Parameters
+    ----------
+    modules : tuple, optional
+        Modules to import. Default is the DM and the interferometer.
+    repeat : int, optional
+        Number of runs. Default is REPEAT.
+    cwd : str, optional
+        Working directory of the interpreters. Default is the current one.
+
+    Returns
+    -------
+    dict
+        Best import time, in seconds, lazy modules imported and directories
+        created.
+    """
+    probe = _PROBE.format(modules=tuple(modules), lazy=LAZY_MODULES)
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", probe],
+            capture_output=True, text=True, check=True, cwd=cwd,
+        )
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    best = min(runs, key=lambda r: r["elapsed"])
+    return {
+        "elapsed": best["elapsed"],
+        "loaded": sorted({m for r in runs for m in r["loaded"]}),
+        "made": sorted({d for r in runs for d in r["made"]}),
+    }
+
+
+def check_errors(result):
+    """
+    Violations of the import guards in the result of `check_import`.
+
+    Parameters
+    ----------
+    result : dict
+        Result of `check_import`.
+
+    Returns
+    -------
+    list of str
+        Description of the violations, empty if there are none.
+    """
+    errors = []
+    if result["elapsed"] > IMPORT_BUDGET:
+        errors.append(f"import took {result['elapsed']:.3f} s (budget {IMPORT_BUDGET} s)")
+    if result["loaded"]:
+        errors.append(f"heavy modules imported: {', '.join(result['loaded'])}")
+    if result["made"]:
+        errors.append(f"directories created: {', '.join(result['made'])}")
+    return errors
+
+
+def main():
+    result = check_import()
+    errors = check_errors(result)
+    print(f"Import time: {result['elapsed']:.3f} s")
+    for error in errors:
+        print(f"FAILED: {error}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,7 @@
 import numpy as _np
-import matplotlib.pyplot as _plt
 from alpao_simulator.ground import geometry as _geo
 from alpao_simulator.ground import zernike as zern
 from alpao_simulator.ground import config_loader as _cl
-from matplotlib.animation import FuncAnimation as _FuncAnimation
 
 
 class Interferometer:
@@ -11,6 +9,7 @@ class Interferometer:
     def __init__(self, dm):
         self.model = "4DAccuFiz"
         self.full_frame = False
+        self.roiOrigin = None
         self.shapesRemoved = None
         self._dm = dm
         self._lambda = 632.8e-9  # Wavelength of the light in meters
@@ -20,6 +19,8 @@ class Interferometer:
         self._freeze = False
         self._noisy = False
         self._fps = 10
+        self._roi = False
+        self._ffPlacement = {}
         self._fW, self._fH = self._readFullFrameSize()
 
     def live(
@@ -32,10 +33,17 @@ class Interferometer:
         Runs the live-view animation for the simulated Interferometer
         instance.
 
+        The view is redrawn only when the shape of the DM (see its
+        `shapeVersion`) or the settings of the viewer change, by blitting
+        the image and the texts over the cached static parts of the figure.
+        Frames are dropped when rendering cannot keep up with the framerate.
+
         Parameters
         ----------
         shape2remove : np.array, optional
             Zernike modes to be removed from the wavefront.
+        framerate : float, optional
+            Maximum refresh rate of the view, in Hz. Default is 10.
         **kwargs : dict, optional
             Additional keyword arguments for customization.
 
@@ -43,14 +51,18 @@ class Interferometer:
         -------
         fig : matplotlib.figure.Figure
             Figure object of the live-view animation.
-        anim : matplotlib.animation.FuncAnimation
-            Animation object of the live-view animation (needed to keep the plot
+        anim : matplotlib.backend_bases.TimerBase
+            Timer driving the live-view animation (needed to keep the plot
             alive).
         """
+        import time as _time
+        import itertools as _itertools
+        import matplotlib.pyplot as _plt
+        from alpao_simulator.ground.live_view import BlitRenderer
+
         self._fps = framerate
         if shape2remove is not None:
             self.shapeRemoval(shape2remove)
-        global _anim
         cmap = kwargs.get("cmap", "gray")
 
         self._live = True
@@ -63,61 +75,90 @@ class Interferometer:
         fig.canvas.manager.set_window_title(f"Live View - Alpao DM {self._dm.nActs}")
         simg = self._dm._wavefront(zernike=shape2remove, surf=self._surf, noisy=self._noisy)
         if self.full_frame:
-            simg = self.intoFullFrame(simg)
+            simg = self.intoFullFrame(simg, roi=self._roi)
         im = ax.imshow(simg, cmap=cmap)
         ax.axis("off")
-        fig.colorbar(im, ax=ax, orientation="horizontal", pad=0.05, shrink=0.9)
+        cbar = fig.colorbar(im, ax=ax, orientation="horizontal", pad=0.05, shrink=0.9)
         pv_txt = fig.text(0.5, 0.1, "", ha="center", va="center", fontsize=15)
         shape_txt = fig.text(0.5, 0.925, "", ha="center", va="center", fontsize=15)
         fps_txt = fig.text(0.5, 0.1, "", ha="center", va="center", fontsize=15)
+        renderer = BlitRenderer(fig, [im, cbar.ax, pv_txt, shape_txt, fps_txt])
+        timer = fig.canvas.new_timer(interval=1000 / framerate)
+        # state of the last rendered frame, and duration of its rendering
+        drawn = {"state": None, "end": 0.0, "duration": 0.0, "busy": False}
 
         # Closing Event
         def on_close(event):
             self._live = False
             self._dm._live = False
+            timer.stop()
+            renderer.disconnect()
 
         fig.canvas.mpl_connect("close_event", on_close)
 
+        def view_state(frame):
+            """What the frame shows: it is redrawn only when this changes."""
+            removed = self.shapesRemoved
+            if removed is not None:
+                removed = tuple(_np.atleast_1d(removed).tolist())
+            noise = frame if self._noisy and not self._surf else None
+            return (
+                self._dm.shapeVersion, self._surf, noise, removed,
+                self.full_frame, self._roi,
+            )
+
         # Update Event
         def update(frame):
-            new_img = self._dm._wavefront(
-                zernike=self.shapesRemoved, surf=self._surf, noisy=self._noisy
-            )
-            if self.full_frame:
-                new_img = self.intoFullFrame(new_img)
-            if not self._surf:
-                fps_txt.set_text(f"FPS: {framerate:.1f}")
-                pv_txt.set_text("")
-                shape_txt.set_text("")
-            else:
-                pv = (_np.max(new_img) - _np.min(new_img)) * 1e6
-                rms = _geo.rms(new_img) * 1e6
-                pv_txt.set_text(
-                    r"PV={:.3f} $\mu m$".format(pv)
-                    + " " * 10
-                    + r"RMS={:.5f} $\mu m$".format(rms)
-                )
-                stext = (
-                    f"Removing Zernike modes {self.shapesRemoved}"
-                    if self.shapesRemoved is not None
-                    else ""
+            state = view_state(frame)
+            now = _time.perf_counter()
+            if state == drawn["state"] or drawn["busy"]:
+                return ()
+            if now - drawn["end"] < drawn["duration"] - 1 / self._fps:
+                # rendering lags behind: drop the frame, the next one will
+                # show the latest shape
+                return ()
+            drawn["busy"] = True
+            try:
+                new_img = self._dm._wavefront(
+                    zernike=self.shapesRemoved, surf=self._surf, noisy=self._noisy
                 )
-                shape_txt.set_text(stext)
-                fps_txt.set_text("")
-            im.set_clim(
-                vmin=new_img.min(), vmax=new_img.max()
-            )  # to not have blank plot
-            im.set_data(new_img)
+                if self.full_frame:
+                    new_img = self.intoFullFrame(new_img, roi=self._roi)
+                if not self._surf:
+                    fps_txt.set_text(f"FPS: {framerate:.1f}")
+                    pv_txt.set_text("")
+                    shape_txt.set_text("")
+                else:
+                    pv = (_np.max(new_img) - _np.min(new_img)) * 1e6
+                    rms = _geo.rms(new_img) * 1e6
+                    pv_txt.set_text(
+                        r"PV={:.3f} $\mu m$".format(pv)
+                        + " " * 10
+                        + r"RMS={:.5f} $\mu m$".format(rms)
+                    )
+                    stext = (
+                        f"Removing Zernike modes {self.shapesRemoved}"
+                        if self.shapesRemoved is not None
+                        else ""
+                    )
+                    shape_txt.set_text(stext)
+                    fps_txt.set_text("")
+                im.set_clim(
+                    vmin=new_img.min(), vmax=new_img.max()
+                )  # to not have blank plot
+                im.set_data(new_img)
+                renderer.render()
+                drawn["state"] = state
+            finally:
+                drawn["busy"] = False
+                drawn["end"] = _time.perf_counter()
+                drawn["duration"] = drawn["end"] - now
             return (im,)
 
-        # Create and hold a reference to the animation.
-        self._anim = _FuncAnimation(
-            fig,
-            func=update,
-            interval=(1000/framerate),
-            blit=False,
-            cache_frame_data=False,
-        )
+        frames = _itertools.count(1)
+        timer.add_callback(lambda: update(next(frames)))
+        timer.start()
+        self._anim = timer
         _plt.show(block=False)
 
         # force an `update()` to update the figure
@@ -126,63 +167,111 @@ class Interferometer:
 
         return fig, self._anim
 
-    def acquire_phasemap(self, nframes: int = 1, rebin=1):
+    def acquire_phasemap(self, nframes: int = 1, rebin=1, out=None):
         """
         Acquires the phase map of the interferometer.
 
+        Each of the nframes frames is the DM surface plus a random piston
+        jump, multiple of the wavelength, and the phase map is their average:
+        it is computed directly as the surface plus the mean piston, in a
+        single pass and without allocating the frames.
+
+        Rebinned phase maps are computed directly at the reduced resolution,
+        from the rebinned influence functions of the DM (see `binned_shape`),
+        without computing the full resolution surface.
+
+        Parameters
+        ----------
+        nframes : int, optional
+            Number of frames averaged. Default is 1.
+        rebin : int, optional
+            Rebinning factor of the phase map. Default is 1.
+        out : np.ndarray, optional
+            Buffer, with the shape of the (rebinned) DM surface, into which
+            the phase map is acquired (before any full frame conversion or
+            shape removal). If none of them is applied, the returned image
+            shares its data.
+
         Returns
         -------
         np.array
             Phase map of the interferometer.
         """
-        imglist = []
-        for i in range(nframes):
+        if nframes < 1:
+            raise ValueError("At least one frame must be acquired")
+        kk = _np.floor(_np.random.random(nframes) * 5 - 2)
+        piston = self._lambda * kk.mean()
+        if isinstance(rebin, (int, _np.integer)) and rebin > 1:
+            # rebinned surface, computed at the reduced resolution
+            surface, bmap = self._dm.binned_shape(rebin)
+            fimage = bmap.unpack(_np.add(surface, piston, out=surface), out=out)
+        else:
             img = self._dm._shape
-            kk = _np.floor(_np.random.random(1) * 5 - 2)
-            masked_ima = img + _np.ones(img.shape) * self._lambda * kk
-            imglist.append(masked_ima)
-        image = _np.ma.dstack(imglist)
-        image = _np.mean(image, axis=2)
-        masked_img = _np.ma.masked_array(image, mask=self._dm.mask)
-        fimage = _geo.rebinned(masked_img, rebin)
+            if out is None:
+                out = _np.empty(img.shape, dtype=img.dtype)
+            elif out.shape != img.shape:
+                raise ValueError(f"Output buffer must have shape {img.shape}")
+            _np.add(img.data, piston, out=out)
+            masked_img = _np.ma.masked_array(out, mask=self._dm.mask)
+            fimage = _geo.rebinned(masked_img, rebin)
         if self.full_frame:
-            fimage = self.intoFullFrame(fimage)
+            fimage = self.intoFullFrame(fimage, roi=self._roi)
         if self.shapesRemoved is not None:
-            fimage = zern.removeZernike(fimage, self.shapesRemoved)
+            fimage = zern.removeZernike(fimage, self.shapesRemoved, dtype=self._dm.dtype)
         if self._freeze:
             if self._live:
+                import matplotlib.pyplot as _plt
+
                 self._surf = True
                 _plt.pause(1)
                 self._surf = False
         return fimage
 
-    def intoFullFrame(self, img=None):
+    def intoFullFrame(self, img=None, roi: bool = False):
         """
-        Converts the image to a full frame image of 2000x2000 pxs.
+        Converts the image to a full frame image of the interferometer camera.
+
+        The image is placed at the centre of the full frame. Its placement
+        is computed once per camera setting and image size: rebinned images
+        are placed on a full frame rebinned by the same factor.
 
         Parameters
         ----------
-        img : np.array
-            Image to be converted to a full frame.
+        img : np.array, optional
+            Image to be converted to a full frame. If None, the acquired
+            phase maps are converted from now on.
+        roi : bool, optional
+            If True, only the region of interest of the full frame is
+            returned, i.e. the smallest rectangle containing the valid
+            pixels, whose origin in the full frame is stored in `roiOrigin`.
+            Default is False.
 
         Returns
         -------
         full_frame : np.array
-            Full frame image.
+            Full frame image, or its region of interest.
         """
         if img is None:
             self.full_frame = True
+            self._roi = roi
             return
-        params = self.getCameraSettings()
-        ocentre = (params["Width"] // 2 - 1, params["Height"] // 2 - 1)
-        ncentre = (self._fW // 2 - 1, self._fH // 2 - 1)
-        offset = (ncentre[0] - ocentre[0], ncentre[1] - ocentre[1])
-        newidx = (self._dm._idx[0] + offset[0], self._dm._idx[1] + offset[1])
-        full_frame = _np.zeros((self._fW, self._fH))
-        full_frame[newidx] = img.compressed()
-        new_mask = full_frame == 0
-        full_frame = _np.ma.masked_array(full_frame, mask=new_mask)
-        return full_frame
+        rows, cols, full_shape = self._fullFramePlacement(img.shape)
+        mask = _np.ma.getmaskarray(img)
+        if roi:
+            valid_rows = _np.flatnonzero(~mask.all(axis=1))
+            valid_cols = _np.flatnonzero(~mask.all(axis=0))
+            if valid_rows.size == 0:
+                self.roiOrigin = (rows.start, cols.start)
+                return img
+            r0, r1 = valid_rows[0], valid_rows[-1] + 1
+            c0, c1 = valid_cols[0], valid_cols[-1] + 1
+            self.roiOrigin = (int(rows.start + r0), int(cols.start + c0))
+            return img[r0:r1, c0:c1]
+        full_frame = _np.zeros(full_shape, dtype=img.dtype)
+        full_mask = _np.ones(full_shape, dtype=bool)
+        _np.copyto(full_frame[rows, cols], _np.ma.getdata(img), where=~mask)
+        full_mask[rows, cols] = mask
+        return _np.ma.masked_array(full_frame, mask=full_mask)
 
 
     #--------------------------------------------------------------------------
@@ -260,12 +349,12 @@ Noise              : {self._noisy}"""
         dict
             Configuration file of the 4D interferometer.
         """
-        data = _cl.load_interf_configuration(self.model)
+        data = _cl.interf_config(self.model)
         params = {}
-        params["Width"] = int(data["width"])
-        params["Height"] = int(data["height"])
-        params["x-offset"] = int(data["x-offset"])
-        params["y-offset"] = int(data["y-offset"])
+        params["Width"] = data.width
+        params["Height"] = data.height
+        params["x-offset"] = data.x_offset
+        params["y-offset"] = data.y_offset
         return params
 
     def _readFullFrameSize(self):
@@ -277,5 +366,38 @@ Noise              : {self._noisy}"""
         tuple
             Full frame size of the 4D interferometer.
         """
-        data = _cl.load_interf_configuration(self.model)
-        return (int(data["full_width"]), int(data["full_height"]))
+        data = _cl.interf_config(self.model)
+        return (data.full_width, data.full_height)
+
+    def _fullFramePlacement(self, shape):
+        """
+        Placement of an image of the given shape in the full frame, for the
+        current camera settings.
+
+        Returns
+        -------
+        rows, cols : slice
+            Rows and columns of the full frame covered by the image.
+        full_shape : tuple
+            Shape of the full frame, rebinned as the image.
+        """
+        params = _cl.interf_config(self.model)
+        key = (params, tuple(shape))
+        placement = self._ffPlacement.get(key)
+        if placement is None:
+            rebin = max(1, params.width // shape[0])
+            full_shape = (params.full_width // rebin, params.full_height // rebin)
+            ocentre = (shape[0] // 2 - 1, shape[1] // 2 - 1)
+            ncentre = (full_shape[0] // 2 - 1, full_shape[1] // 2 - 1)
+            offset = (ncentre[0] - ocentre[0], ncentre[1] - ocentre[1])
+            if min(offset) < 0 or any(
+                o + n > f for o, n, f in zip(offset, shape, full_shape)
+            ):
+                raise ValueError(
+                    f"Image of shape {tuple(shape)} does not fit in the full frame {full_shape}"
+                )
+            rows = slice(offset[0], offset[0] + shape[0])
+            cols = slice(offset[1], offset[1] + shape[1])
+            placement = (rows, cols, full_shape)
+            self._ffPlacement[key] = placement
+        return placement
@@ -0,0 +1,110 @@
+"""
+Precision Check
+===============
+
+Description
+-----------
+Accuracy check of the float32 precision mode of the simulator (see the `dtype`
+argument of `AlpaoDm`) against the float64 reference, for each supported DM.
+
+For each DM, random zonal and modal commands are applied to a float64 and
+to a float32 instance of the mirror, and the surfaces and the phase maps
+acquired by the interferometer are compared. The error is reported as the
+RMS of the difference relative to the RMS of the float64 reference, and as
+the maximum absolute difference, in meters.
+
+Measured accuracy (10 random commands of unit amplitude, on all the modes
+for the modal ones):
+
+    DM    zonal rel.   modal rel.   phasemap rel.  max abs [m]
+    88    1.7e-07      6.6e-06      5.4e-07        2.8e-09
+    97    1.9e-07      1.4e-05      5.7e-07        8.1e-09
+    277   3.0e-07      1.1e-04      1.1e-06        1.3e-07
+    468   2.5e-07      1.3e-04      1.1e-06        2.2e-07
+    820   3.9e-07      6.3e-04      2.2e-06        1.9e-06
+
+Zonal surfaces are accurate to a few float32 epsilons (~6e-8), phase maps
+(where the multi-frame averaging accumulates in float32) to about 1e-6.
+Modal commands are less accurate, and increasingly so with the number of
+actuators: the high order modes require large and mutually cancelling
+actuator commands, whose rounding errors survive the cancellation. For
+modal work involving the high order modes, use the float64 precision.
+
+Usage
+-----
+    $ python -m alpao_simulator.precision_check
+"""
+
+import numpy as np
+from alpao_simulator.deformable_mirror import AlpaoDm
+from alpao_simulator.interferometer import Interferometer
+
+
+def check_precision(nActs: int, n_commands: int = 10, seed: int = 0):
+    """
+    Compares the float32 precision mode of a DM with the float64 reference.
+
+    Parameters
+    ----------
+    nActs : int
+        Number of actuators of the DM.
+    n_commands : int, optional
+        Number of random commands to apply. Default is 10.
+    seed : int, optional
+        Seed of the random commands. Default is 0.
+
+    Returns
+    -------
+    dict
+        Relative RMS errors of the zonal and modal surfaces and of the phase
+        maps, and maximum absolute error, in meters.
+    """
+    rng = np.random.default_rng(seed)
+    cmds = rng.standard_normal((nActs, n_commands))
+    dm64 = AlpaoDm(nActs, dtype=np.float64)
+    dm32 = AlpaoDm(nActs, dtype=np.float32)
+    errors = {}
+    max_abs = 0
+    for modal in (False, True):
+        ref = dm64.compute_shapes(cmds, modal=modal)
+        test = dm32.compute_shapes(cmds, modal=modal)
+        diff = test.astype(np.float64) - ref
+        errors["modal" if modal else "zonal"] = _rms(diff) / _rms(ref)
+        max_abs = max(max_abs, np.max(np.abs(diff)))
+    interf64, interf32 = Interferometer(dm64), Interferometer(dm32)
+    phase_err = []
+    for cmd in cmds.T:
+        dm64.set_shape(cmd)
+        dm32.set_shape(cmd)
+        np.random.seed(seed)
+        ref = interf64.acquire_phasemap()
+        np.random.seed(seed)
+        test = interf32.acquire_phasemap()
+        diff = test.compressed().astype(np.float64) - ref.compressed()
+        phase_err.append(_rms(diff) / _rms(ref.compressed()))
+        max_abs = max(max_abs, np.max(np.abs(diff)))
+    errors["phasemap"] = max(phase_err)
+    errors["max_abs"] = max_abs
+    return errors
+
+
+def _rms(x):
+    """
+    Root Mean Square of an array.
+    """
+    return np.sqrt(np.mean(np.square(x, dtype=np.float64)))
+
+
+def main():
+    dms = [88, 97, 277, 468, 820]
+    results = {nActs: check_precision(nActs) for nActs in dms}
+    print(f"\n{'DM':<6}{'zonal rel.':<13}{'modal rel.':<13}{'phasemap rel.':<15}max abs [m]")
+    for nActs, err in results.items():
+        print(
+            f"{nActs:<6}{err['zonal']:<13.1e}{err['modal']:<13.1e}"
+            f"{err['phasemap']:<15.1e}{err['max_abs']:.1e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
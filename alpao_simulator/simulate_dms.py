@@ -8,15 +8,14 @@ def main():
           f"To change the folder, modify the 'path' in the '{fp.CONFIGURATION_FILE}' file.\n"
     )
     for Nacts in dms:
-        if os.path.exists(fp.INFLUENCE_FUNCTIONS_FILE(Nacts)):
-            print(f"DM {Nacts} simulation already exists.")
+        if fp.DM_DATA_FILES(Nacts):
+            print(f"DM {Nacts} simulation already exists "\
+                  "(it is rebuilt automatically if the configuration changes).")
             response = input(f"Would you like to overwrite it? (y/n) ")
             if response == 'y':
-                # Erase existing data
-                os.remove(fp.INFLUENCE_FUNCTIONS_FILE(Nacts))
-                os.remove(fp.INTMAT_FILE(Nacts))
-                os.remove(fp.ZERNMAT_FILE(Nacts))
-                os.remove(fp.RECMAT_FILE(Nacts))
+                # Erase existing data, for all the configurations
+                for file in fp.DM_DATA_FILES(Nacts):
+                    os.remove(file)
             else:
                 continue
         dm = AlpaoDm(Nacts)
@@ -0,0 +1,29 @@
+import pytest
+import alpao_simulator.folder_paths as fp
+
+
+@pytest.fixture(scope="session", autouse=True)
+def data_path(tmp_path_factory):
+    """
+    Data folders of the simulator in a temporary directory, so that the tests
+    never touch the configured ones (nor need the `m4` package).
+    """
+    base = tmp_path_factory.mktemp("alpaodata")
+    (base / "opd").mkdir()
+    fp.BASE_PATH = str(base)
+    fp.OPD_IMAGES_FOLDER = str(base / "opd")
+    return base
+
+
+@pytest.fixture(scope="session")
+def dm(data_path):
+    from alpao_simulator.deformable_mirror import AlpaoDm
+
+    return AlpaoDm(88)
+
+
+@pytest.fixture
+def interf(dm):
+    from alpao_simulator.interferometer import Interferometer
+
+    return Interferometer(dm)
@@ -0,0 +1,77 @@
+import os
+import numpy as np
+import pytest
+import alpao_simulator.folder_paths as fp
+from alpao_simulator.ground import geometry as _geo
+from alpao_simulator.ground import frame_store as fs
+
+
+def _acquire(interf, rebin, **kwargs):
+    np.random.seed(3)
+    return interf.acquire_phasemap(rebin=rebin, **kwargs)
+
+
+def _assert_binned_matches_full(interf, rebin):
+    binned = _acquire(interf, rebin)
+    full = _geo.rebinned(_acquire(interf, 1), rebin)
+    np.testing.assert_array_equal(binned.mask, full.mask)
+    np.testing.assert_allclose(binned.data, full.data, rtol=0, atol=1e-12 * np.abs(full).max())
+
+
+@pytest.mark.parametrize("rebin", [2, 4])
+def test_binned_matches_full(dm, interf, rebin):
+    rng = np.random.default_rng(0)
+    for _ in range(3):
+        dm.set_shape(rng.standard_normal(dm.nActs))
+        _assert_binned_matches_full(interf, rebin)
+
+
+def test_binned_out(dm, interf):
+    out = np.empty((128, 128))
+    img = _acquire(interf, 4, out=out)
+    assert np.shares_memory(img.data, out)
+    with pytest.raises(ValueError):
+        _acquire(interf, 4, out=np.empty((512, 512)))
+
+
+def test_binned_after_surface_writes(dm, interf):
+    rng = np.random.default_rng(1)
+    dm.set_shape(rng.standard_normal(dm.nActs))
+    _assert_binned_matches_full(interf, 4)
+    # writes to the surface which are not actuators moves
+    dm._shape[dm._idx] += 1e-7 * rng.standard_normal(dm._idx[0].size)
+    dm.set_shape(rng.standard_normal(dm.nActs))
+    _assert_binned_matches_full(interf, 4)
+    dm.cmdHistory = rng.standard_normal((dm.nActs, 3))
+    dm.runCmdHistory(pipelined=True, progress=lambda *a: None)
+    dm.set_shape(rng.standard_normal(dm.nActs))
+    _assert_binned_matches_full(interf, 4)
+
+
+def test_pipelined_binned_history(dm, interf):
+    dm.cmdHistory = np.random.default_rng(2).standard_normal((dm.nActs, 4))
+    cubes = []
+    for pipelined in (False, True):
+        dm.set_shape(np.zeros(dm.nActs))
+        np.random.seed(5)
+        tn = dm.runCmdHistory(
+            interf, save=f"binned_{pipelined}", rebin=4, pipelined=pipelined,
+            output="cube", progress=lambda *a: None,
+        )
+        cubes.append(fs.load_frames(os.path.join(fp.OPD_IMAGES_FOLDER, tn)))
+    for i in range(4):
+        ref = cubes[0][:, :, i].compressed()
+        np.testing.assert_allclose(
+            cubes[1][:, :, i].compressed(), ref, rtol=0, atol=1e-12 * np.abs(ref).max()
+        )
+
+
+@pytest.mark.parametrize("rebin", [1, 2, 4])
+def test_float32_precision(dm, rebin):
+    from alpao_simulator.deformable_mirror import AlpaoDm
+    from alpao_simulator.interferometer import Interferometer
+
+    dm32 = AlpaoDm(dm.nActs, dtype=np.float32)
+    dm32.set_shape(np.random.default_rng(0).standard_normal(dm.nActs))
+    img = Interferometer(dm32).acquire_phasemap(rebin=rebin)
+    assert img.dtype == np.float32
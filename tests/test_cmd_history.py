@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def commands():
+    return np.random.default_rng(0).standard_normal((88, 4))
+
+
+def _surfaces(dm, source):
+    return [(i, cmd.copy(), img.compressed()) for i, cmd, img in dm.iterCmdHistory(source)]
+
+
+@pytest.mark.parametrize("kind", ["str", "path"])
+def test_iter_file_source(dm, commands, tmp_path, kind):
+    path = tmp_path / "commands.npy"
+    np.save(path, commands)
+    expected = _surfaces(dm, commands)
+    got = _surfaces(dm, str(path) if kind == "str" else path)
+    assert len(got) == commands.shape[1]
+    for (i, cmd, img), (j, ref_cmd, ref_img) in zip(got, expected):
+        assert i == j
+        np.testing.assert_array_equal(cmd, ref_cmd)
+        np.testing.assert_allclose(img, ref_img, rtol=0, atol=1e-12 * np.abs(ref_img).max())
+
+
+def test_iter_generator_source(dm, commands):
+    expected = _surfaces(dm, commands)
+    got = _surfaces(dm, (c for c in commands.T))
+    for (_, _, img), (_, _, ref_img) in zip(got, expected):
+        np.testing.assert_allclose(img, ref_img, rtol=0, atol=1e-12 * np.abs(ref_img).max())
+
+
+@pytest.mark.parametrize("initial", [0.0, 1.0])
+def test_iter_restores_shape(dm, commands, initial):
+    dm.set_shape(np.full(dm.nActs, initial))
+    positions = dm.get_shape()
+    surface = dm._shape.data.copy()
+    for i, _, _ in dm.iterCmdHistory(commands):
+        if i == 1:
+            break
+    np.testing.assert_allclose(dm.get_shape(), positions, rtol=1e-12, atol=1e-20)
+    np.testing.assert_allclose(dm._shape.data, surface, rtol=0, atol=1e-12 * np.abs(surface).max())
@@ -0,0 +1,55 @@
+import os
+import numpy as np
+import pytest
+import alpao_simulator.folder_paths as fp
+from alpao_simulator.ground import frame_store as fs
+
+
+def _frames(mask, n):
+    rng = np.random.default_rng(0)
+    return [np.ma.masked_array(rng.standard_normal(mask.shape), mask=mask) for _ in range(n)]
+
+
+def test_round_trip(tmp_path):
+    mask = np.zeros((16, 16), dtype=bool)
+    mask[:4] = True
+    frames = _frames(mask, 5)
+    commands = np.arange(15.0).reshape(3, 5)
+    with fs.FrameStore(str(tmp_path), 5, commands=commands, info={"rebin": 1}) as store:
+        for i in (3, 0, 4, 1, 2):
+            store.write(i, frames[i])
+    cube = fs.load_frames(str(tmp_path))
+    assert cube.shape == (16, 16, 5)
+    for i, frame in enumerate(frames):
+        np.testing.assert_array_equal(cube[:, :, i].mask, mask)
+        np.testing.assert_array_equal(cube[:, :, i].compressed(), frame.compressed())
+    np.testing.assert_array_equal(fs.load_commands(str(tmp_path)), commands)
+    assert fs.load_info(str(tmp_path)) == {"rebin": 1, "n_frames": 5, "n_written": 5}
+
+
+def test_mask_mismatch(tmp_path):
+    mask = np.zeros((8, 8), dtype=bool)
+    store = fs.FrameStore(str(tmp_path), 2)
+    store.write(0, np.ma.masked_array(np.ones((8, 8)), mask=mask))
+    with pytest.raises(ValueError):
+        store.write(1, np.ma.masked_array(np.ones((8, 8)), mask=~mask))
+
+
+def test_empty_store(tmp_path):
+    fs.FrameStore(str(tmp_path), 2).close()
+    with pytest.raises(FileNotFoundError, match="No frames"):
+        fs.load_frames(str(tmp_path))
+
+
+def test_runCmdHistory_cube(dm, interf):
+    dm.cmdHistory = np.random.default_rng(0).standard_normal((dm.nActs, 3))
+    tn = dm.runCmdHistory(interf, output="cube", rebin=4, progress=lambda *a: None)
+    cube = fs.load_frames(os.path.join(fp.OPD_IMAGES_FOLDER, tn))
+    assert cube.shape == (128, 128, 3)
+    assert fs.load_info(os.path.join(fp.OPD_IMAGES_FOLDER, tn))["n_written"] == 3
+
+
+def test_runCmdHistory_cube_needs_interferometer(dm):
+    dm.cmdHistory = np.zeros((dm.nActs, 3))
+    with pytest.raises(ValueError):
+        dm.runCmdHistory(output="cube")
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize("rebin", [1, 4])
+def test_full_frame(dm, interf, rebin):
+    img = interf.acquire_phasemap(rebin=rebin)
+    full = interf.intoFullFrame(img)
+    assert full.shape == (1024 // rebin, 1024 // rebin)
+    np.testing.assert_array_equal(np.sort(full.compressed()), np.sort(img.compressed()))
+
+
+@pytest.mark.parametrize("rebin", [1, 4])
+def test_roi_placement(dm, interf, rebin):
+    img = interf.acquire_phasemap(rebin=rebin)
+    full = interf.intoFullFrame(img)
+    roi = interf.intoFullFrame(img, roi=True)
+    r0, c0 = interf.roiOrigin
+    h, w = roi.shape
+    # the ROI is the bounding box of the valid pixels, at its full frame place
+    window = full[r0 : r0 + h, c0 : c0 + w]
+    np.testing.assert_array_equal(roi.mask, window.mask)
+    np.testing.assert_array_equal(roi.compressed(), window.compressed())
+    assert window.count() == full.count()
+    assert not roi.mask[0].all() and not roi.mask[-1].all()
+    assert not roi.mask[:, 0].all() and not roi.mask[:, -1].all()
+
+
+def test_full_frame_acquisition(dm, interf):
+    interf.intoFullFrame(roi=True)
+    try:
+        img = interf.acquire_phasemap()
+        assert img.shape != (1024, 1024) and interf.roiOrigin is not None
+    finally:
+        interf.full_frame = False
@@ -0,0 +1,11 @@
+import os
+from alpao_simulator import import_check
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_is_fast_and_side_effect_free():
+    result = import_check.check_import(cwd=ROOT)
+    assert result["made"] == []
+    assert result["loaded"] == []
+    assert import_check.check_errors(result) == []
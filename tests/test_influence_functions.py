@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+import alpao_simulator.ground.influence_functions as iff
+
+
+def test_pixel_blocks_cover_pixels():
+    for budget in (0.5, 1024):
+        blocks = iff.pixel_blocks(10000, 88, mem_budget=budget)
+        covered = np.concatenate([np.arange(b.start, b.stop) for b in blocks])
+        np.testing.assert_array_equal(covered, np.arange(10000))
+
+
+def test_pixel_blocks_size():
+    # capped by the rows limit, whatever the budget
+    assert len(iff.pixel_blocks(10 * iff.BLOCK_ROWS, 88)) == 10
+    # and by the budget
+    assert all(b.stop - b.start <= 200 for b in iff.pixel_blocks(1000, 88, mem_budget=0.5))
+
+
+def test_parallel_generation(dm):
+    serial = iff.generate_zonal_iffs(dm._scaledActCoords, dm.mask, workers=1)
+    parallel = iff.generate_zonal_iffs(dm._scaledActCoords, dm.mask, workers=3)
+    np.testing.assert_array_equal(parallel, serial)
+
+
+def test_generation_matches_tps(dm):
+    ThinPlateSpline = pytest.importorskip("tps").ThinPlateSpline
+    # the mirror pupil, sampled every 4 pixels
+    rows, cols = np.indices(dm.mask.shape)
+    mask = dm.mask | (rows % 4 != 0) | (cols % 4 != 0)
+    packed = iff.generate_zonal_iffs(dm._scaledActCoords, mask)
+    pix_coords = iff.valid_pixel_coords(mask)
+    for k in range(dm.nActs):
+        push = np.zeros(dm.nActs)
+        push[k] = 1.0
+        spline = ThinPlateSpline(alpha=0.0)
+        spline.fit(dm._scaledActCoords, push)
+        expected = spline.transform(pix_coords).ravel()
+        np.testing.assert_allclose(packed[:, k], expected, rtol=0, atol=1e-10)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from alpao_simulator.ground.live_view import BlitRenderer
+
+
+class _NoBlitCanvas(FigureCanvasAgg):
+    supports_blit = False
+
+
+def _figure(canvas_class):
+    fig = Figure(figsize=(2, 2), dpi=50)
+    canvas_class(fig)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.axis("off")
+    im = ax.imshow(np.zeros((8, 8)), cmap="gray", vmin=0, vmax=1)
+    return fig, im
+
+
+def _mean_pixel(fig):
+    return np.asarray(fig.canvas.buffer_rgba())[..., :3].mean()
+
+
+@pytest.mark.parametrize("canvas_class", [FigureCanvasAgg, _NoBlitCanvas])
+def test_render_draws_artists(canvas_class):
+    fig, im = _figure(canvas_class)
+    renderer = BlitRenderer(fig, [im])
+    renderer.render()
+    assert _mean_pixel(fig) == pytest.approx(0)  # black image, not the white figure
+    im.set_data(np.ones((8, 8)))
+    renderer.render()
+    assert _mean_pixel(fig) == pytest.approx(255)
+    im.set_data(np.zeros((8, 8)))
+    renderer.render()
+    assert _mean_pixel(fig) == pytest.approx(0)
+
+
+def test_blitting_uses_background():
+    fig, im = _figure(FigureCanvasAgg)
+    renderer = BlitRenderer(fig, [im])
+    renderer.render()
+    draws = []
+    fig.canvas.mpl_connect("draw_event", lambda event: draws.append(event))
+    for value in (0.5, 1.0):
+        im.set_data(np.full((8, 8), value))
+        renderer.render()
+    assert draws == []  # frames are blitted, not fully drawn
@@ -0,0 +1,107 @@
+import threading
+import numpy as np
+import pytest
+from alpao_simulator.ground import pipeline as _pipe
+
+TIMEOUT = 10  # s
+
+
+def _run(func):
+    """
+    Runs a function in a thread, failing if it hangs, and returns its error.
+    """
+    result = {}
+
+    def target():
+        try:
+            func()
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(TIMEOUT)
+    assert not thread.is_alive(), "deadlock"
+    return result.get("error")
+
+
+def test_background_order():
+    assert list(_pipe.background(iter(range(20)), maxsize=2)) == list(range(20))
+
+
+def test_background_producer_error():
+    def produce():
+        yield 0
+        raise KeyError("producer")
+
+    def consume():
+        for _ in _pipe.background(produce()):
+            pass
+
+    assert isinstance(_run(consume), KeyError)
+
+
+def test_background_consumer_error_with_full_queue():
+    produced = threading.Event()
+
+    def produce():
+        yield from range(3)
+        produced.set()
+
+    def consume():
+        for _ in _pipe.background(produce(), maxsize=2):
+            # the producer has finished, and waits to queue the end
+            produced.wait(TIMEOUT)
+            raise RuntimeError("consumer")
+
+    assert isinstance(_run(consume), RuntimeError)
+
+
+def test_writer_pool_error():
+    def write(i):
+        if i == 2:
+            raise OSError("disk full")
+
+    def run():
+        with _pipe.WriterPool(workers=2) as pool:
+            for i in range(5):
+                pool.submit(write, i)
+
+    assert isinstance(_run(run), OSError)
+
+
+@pytest.mark.parametrize("initial", [0.0, 1.0])
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_runCmdHistory_error(dm, interf, monkeypatch, pipelined, initial):
+    dm.set_shape(np.full(dm.nActs, initial))
+    positions = dm.get_shape()
+    surface = dm._shape.data.copy()
+    acquire = interf.acquire_phasemap
+    acquired = []
+
+    def failing(*args, **kwargs):
+        if len(acquired) == 3:
+            raise RuntimeError("camera")
+        acquired.append(1)
+        return acquire(*args, **kwargs)
+
+    monkeypatch.setattr(interf, "acquire_phasemap", failing)
+    dm.cmdHistory = np.random.default_rng(0).standard_normal((dm.nActs, 5))
+    error = _run(
+        lambda: dm.runCmdHistory(interf, pipelined=pipelined, progress=lambda *a: None)
+    )
+    assert isinstance(error, RuntimeError)
+    # the initial shape is restored
+    np.testing.assert_allclose(dm.get_shape(), positions, rtol=1e-12, atol=1e-20)
+    np.testing.assert_allclose(dm._shape.data, surface, rtol=0, atol=1e-12 * np.abs(surface).max())
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_runCmdHistory_restores_shape(dm, interf, pipelined):
+    dm.set_shape(np.ones(dm.nActs))
+    positions = dm.get_shape()
+    surface = dm._shape.data.copy()
+    dm.cmdHistory = np.random.default_rng(1).standard_normal((dm.nActs, 3))
+    dm.runCmdHistory(interf, pipelined=pipelined, rebin=4, progress=lambda *a: None)
+    np.testing.assert_allclose(dm.get_shape(), positions, rtol=1e-12, atol=1e-20)
+    np.testing.assert_allclose(dm._shape.data, surface, rtol=0, atol=1e-12 * np.abs(surface).max())
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from alpao_simulator.ground import rebinning
+from alpao_simulator.ground import geometry as _geo
+
+
+@pytest.fixture(scope="module")
+def img():
+    rng = np.random.default_rng(0)
+    yy, xx = np.mgrid[-32:32, -32:32]
+    mask = np.hypot(xx + 0.5, yy + 0.5) > 27
+    return np.ma.masked_array(rng.standard_normal((64, 64)), mask=mask)
+
+
+def _reference(img, factor):
+    """Mean of the valid pixels of each bin, masked where there are none."""
+    h, w = img.shape[0] // factor, img.shape[1] // factor
+    blocks = img.reshape(h, factor, w, factor).swapaxes(1, 2).reshape(h, w, -1)
+    return blocks.mean(axis=2)
+
+
+@pytest.mark.parametrize("factor", [1, 2, 4, 8])
+def test_rebin_image(img, factor):
+    res = rebinning.bin_map(img.mask, factor).rebin_image(img)
+    ref = _reference(img, factor)
+    np.testing.assert_array_equal(res.mask, np.ma.getmaskarray(ref))
+    np.testing.assert_allclose(res.compressed(), ref.compressed(), rtol=1e-12)
+
+
+def test_rebin_packed(img):
+    bmap = rebinning.bin_map(img.mask, 4)
+    packed = np.column_stack([img.compressed(), 2 * img.compressed()])
+    res = bmap.rebin(packed)
+    assert res.shape == (bmap.nbins, 2)
+    np.testing.assert_allclose(res[:, 0], bmap.rebin_image(img).compressed(), rtol=1e-12)
+    np.testing.assert_allclose(res[:, 1], 2 * res[:, 0], rtol=1e-12)
+
+
+def test_unpack_out(img):
+    bmap = rebinning.bin_map(img.mask, 4)
+    out = np.full(bmap.shape, np.nan)
+    res = bmap.unpack(bmap.rebin(img.compressed()), out=out)
+    assert np.shares_memory(res.data, out)
+    np.testing.assert_array_equal(out[bmap.mask], 0)
+    with pytest.raises(ValueError):
+        bmap.unpack(bmap.rebin(img.compressed()), out=np.empty((3, 3)))
+
+
+def test_invalid_factor(img):
+    with pytest.raises(ValueError):
+        rebinning.BinMap(img.mask, 3)
+
+
+def test_cache(img):
+    assert rebinning.bin_map(img.mask, 2) is rebinning.bin_map(img.mask.copy(), 2)
+    assert rebinning.bin_map(img.mask, 2) is not rebinning.bin_map(~img.mask, 2)
+
+
+def test_geometry_rebinned(img):
+    np.testing.assert_allclose(
+        _geo.rebinned(img, 4).compressed(), _reference(img, 4).compressed(), rtol=1e-12
+    )
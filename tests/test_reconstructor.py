@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from alpao_simulator.ground.reconstructor import Reconstructor
+
+
+@pytest.fixture(scope="module")
+def IM():
+    rng = np.random.default_rng(0)
+    return rng.standard_normal((20, 500)) * np.logspace(0, -4, 20)[:, None]
+
+
+def test_default_is_svd(IM):
+    assert Reconstructor(IM).method == "svd"
+
+
+@pytest.mark.parametrize("method, rtol", [("svd", 1e-10), ("gram", 1e-6)])
+def test_matrix_is_pinv(IM, method, rtol):
+    RM = Reconstructor(IM, method).matrix()
+    pinv = np.linalg.pinv(IM)
+    np.testing.assert_allclose(RM, pinv, rtol=0, atol=rtol * np.abs(pinv).max())
+
+
+def test_reconstruct_matches_matrix(IM):
+    rec = Reconstructor(IM)
+    imgs = np.random.default_rng(1).standard_normal((3, IM.shape[1]))
+    for kwargs in ({}, {"n_modes": 10}, {"tikhonov": 1e-3}):
+        np.testing.assert_allclose(
+            rec.reconstruct(imgs, **kwargs), imgs @ rec.matrix(**kwargs), rtol=1e-10
+        )
+
+
+def test_truncation_and_regularization(IM):
+    rec = Reconstructor(IM)
+    U = np.linalg.svd(IM, full_matrices=False)[0]
+    # commands on the first singular mode are kept, on the last one discarded
+    np.testing.assert_allclose(rec.reconstruct(U[:, 0] @ IM, n_modes=1), U[:, 0], atol=1e-10)
+    np.testing.assert_allclose(rec.reconstruct(U[:, -1] @ IM, n_modes=1), 0, atol=1e-10)
+    assert np.linalg.norm(rec.matrix(tikhonov=1.0)) < np.linalg.norm(rec.matrix())
+
+
+def test_dm_default_rm_is_pinv(dm):
+    assert dm.recMethod == "svd"
+    IM = dm._cache.load(dm._imName)
+    np.testing.assert_array_equal(dm.RM, np.linalg.pinv(IM))
+    with pytest.raises(ValueError):
+        dm.recMethod = "qr"
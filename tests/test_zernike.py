@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from alpao_simulator.ground import zernike as zern
+
+
+@pytest.fixture(scope="module")
+def img():
+    yy, xx = np.mgrid[-32:32, -32:32]
+    mask = np.hypot(xx, yy) > 30
+    data = 3.0 + 0.5 * xx - 0.2 * yy + np.sin(xx / 5.0)
+    return np.ma.masked_array(data, mask=mask)
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32, np.int16])
+def test_default_precision_is_float64(img, dtype):
+    typed = np.ma.masked_array(img.data.astype(dtype), mask=img.mask)
+    assert zern.removeZernike(typed, [1, 2, 3]).dtype == np.float64
+    coeff, mat = zern.zernikeFit(typed, [1, 2, 3])
+    assert zern.zernikeSurface(typed, coeff, mat).dtype == np.float64
+
+
+def test_explicit_float32(img):
+    res = zern.removeZernike(img, [1, 2, 3], dtype=np.float32)
+    assert res.dtype == np.float32
+    np.testing.assert_allclose(res, zern.removeZernike(img, [1, 2, 3]), atol=1e-5)
+
+
+def test_piston_tilt_removed(img):
+    res = zern.removeZernike(img, [1, 2, 3])
+    np.testing.assert_array_equal(res.mask, img.mask)
+    coeff, _ = zern.zernikeFit(res, [1, 2, 3])
+    np.testing.assert_allclose(coeff, 0, atol=1e-10)
+
+
+@pytest.fixture(scope="module")
+def cube(img):
+    rng = np.random.default_rng(0)
+    data = img.data[:, :, None] * rng.standard_normal(5) + rng.standard_normal((64, 64, 5))
+    mask = np.repeat(img.mask[:, :, None], 5, axis=2)
+    mask[:10, :, 3:] = True  # two masks
+    return np.ma.masked_array(data, mask=mask)
+
+
+def _frame_by_frame(cube, modes):
+    return [zern.removeZernike(cube[:, :, i], modes) for i in range(cube.shape[2])]
+
+
+def test_cube_matches_frames(cube):
+    res = zern.removeZernikeCube(cube, [1, 2, 3, 4])
+    for i, frame in enumerate(_frame_by_frame(cube, [1, 2, 3, 4])):
+        np.testing.assert_array_equal(res[:, :, i].mask, frame.mask)
+        np.testing.assert_allclose(res[:, :, i].compressed(), frame.compressed(), atol=1e-12)
+
+
+def test_cube_fortran_out(cube):
+    out = np.empty(cube.shape, order="F")
+    res = zern.removeZernikeCube(cube, [1, 2, 3], out=out)
+    assert res.data is out or np.shares_memory(res.data, out)
+    np.testing.assert_allclose(out, zern.removeZernikeCube(cube, [1, 2, 3]).data, atol=1e-12)
+
+
+def test_cube_in_place(cube):
+    data = np.asfortranarray(cube.data)
+    inplace = np.ma.masked_array(data, mask=cube.mask)
+    expected = zern.removeZernikeCube(cube, [1, 2])
+    zern.removeZernikeCube(inplace, [1, 2], out=data)
+    np.testing.assert_allclose(data[~cube.mask], expected.data[~cube.mask], atol=1e-12)
+
+
+def test_stored_cube_in_place(tmp_path, img):
+    from alpao_simulator.ground import frame_store as fs
+
+    rng = np.random.default_rng(1)
+    frames = [np.ma.masked_array(img.data * rng.standard_normal(), mask=img.mask) for _ in range(4)]
+    with fs.FrameStore(str(tmp_path), 4) as store:
+        for i, frame in enumerate(frames):
+            store.write(i, frame)
+    with pytest.raises(ValueError, match="writable"):
+        stored = fs.load_frames(str(tmp_path))
+        zern.removeZernikeCube(stored, [1, 2, 3], out=stored.data)
+    stored = fs.load_frames(str(tmp_path), mmap_mode="r+")
+    zern.removeZernikeCube(stored, [1, 2, 3], out=stored.data)
+    stored.data.flush()
+    reloaded = fs.load_frames(str(tmp_path))
+    for i, frame in enumerate(frames):
+        np.testing.assert_allclose(
+            reloaded[:, :, i].compressed(),
+            zern.removeZernike(frame, [1, 2, 3]).compressed(),
+            atol=1e-12,
+        )